@@ -1,21 +1,33 @@
 #!/usr/bin/env python3
 import os
+import collections
+import concurrent.futures
+import errno
+import fcntl
+import functools
+import gzip
+import hashlib
+import heapq
 import json
+import math
+import mmap
+import struct
 import subprocess
+import tempfile
 import psutil
 import socket
 import platform
 import re
+import select
+import shutil
+import threading
 import time
+import zlib
 from datetime import datetime
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
 
 app = Flask(__name__)
 
-# Add global variables for disk I/O speed calculation
-prev_disk_io = None
-prev_disk_io_time = None
-
 
 def get_cpu_name():
     try:
@@ -43,39 +55,232 @@ def get_cpu_name():
         return cpu_name
 
 
+class CpuStatSampler:
+    """Computes CPU utilisation from /proc/stat jiffy deltas between two reads"""
+
+    FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+    def __init__(self, path="/proc/stat"):
+        self.path = path
+        self.prev = None
+        self.last = None
+        self.lock = threading.Lock()
+
+    def read_counters(self):
+        counters = {}
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.startswith("cpu"):
+                    break
+                parts = line.split()
+                values = [int(v) for v in parts[1 : len(self.FIELDS) + 1]]
+                values += [0] * (len(self.FIELDS) - len(values))
+                counters[parts[0]] = values
+        return counters
+
+    @staticmethod
+    def busy_percent(prev, current):
+        deltas = [c - p for c, p in zip(current, prev)]
+        total = sum(deltas)
+        if total <= 0:
+            return None, None
+        # Like psutil, idle and iowait both count as not busy
+        busy = total - deltas[3] - deltas[4]
+        return round(busy / total * 100, 1), [d / total * 100 for d in deltas]
+
+    def sample(self):
+        """Return total, per-core and per-state usage since the previous call.
+
+        The first call has no previous counters and reports the average since boot.
+        """
+        current = self.read_counters()
+        with self.lock:
+            prev = self.prev or {}
+            self.prev = current
+
+            zero = [0] * len(self.FIELDS)
+            usage, states = self.busy_percent(prev.get("cpu", zero), current["cpu"])
+            if usage is None:
+                # No jiffies elapsed since the last read, repeat the last result
+                return self.last
+
+            per_cpu = []
+            cpu_index = 0
+            while f"cpu{cpu_index}" in current:
+                name = f"cpu{cpu_index}"
+                core_usage, _ = self.busy_percent(prev.get(name, zero), current[name])
+                per_cpu.append(core_usage if core_usage is not None else 0.0)
+                cpu_index += 1
+
+            self.last = {
+                "usage": usage,
+                "per_cpu_usage": per_cpu,
+                "breakdown": {
+                    field: round(value, 1) for field, value in zip(self.FIELDS, states)
+                },
+            }
+            return self.last
+
+
+cpu_stat_sampler = CpuStatSampler()
+
+
 def get_cpu_info():
     try:
-        # Get per-core usage
-        per_cpu = psutil.cpu_percent(interval=1, percpu=True)
+        cpu_stats = cpu_stat_sampler.sample()
+        cpu_freq = psutil.cpu_freq()
 
         cpu_info = {
             "name": get_cpu_name(),
             "cores": psutil.cpu_count(logical=False),
             "threads": psutil.cpu_count(logical=True),
-            "frequency": psutil.cpu_freq().current if psutil.cpu_freq() else None,
+            "frequency": cpu_freq.current if cpu_freq else None,
             "load_avg": os.getloadavg() if hasattr(os, "getloadavg") else None,
             "temperature": get_cpu_temperature(),
-            "usage": psutil.cpu_percent(interval=1),
-            "per_cpu_usage": per_cpu,
+            "usage": cpu_stats["usage"],
+            "per_cpu_usage": cpu_stats["per_cpu_usage"],
+            "breakdown": cpu_stats["breakdown"],
         }
         return cpu_info
     except Exception as e:
         return {"error": str(e)}
 
 
+HWMON_PATH = "/sys/class/hwmon"
+HWMON_REDISCOVER_INTERVAL = 300
+HWMON_KINDS = {"temp": ("temperatures", 1000.0), "fan": ("fans", 1.0), "in": ("voltages", 1000.0)}
+
+hwmon_input_pattern = re.compile(r"^(temp|fan|in)(\d+)_input$")
+
+
+class HwmonSensor:
+    __slots__ = ("chip", "label", "kind", "scale", "path", "fd", "device")
+
+    def __init__(self, chip, label, kind, scale, path, fd, device=None):
+        self.chip = chip
+        self.label = label
+        self.kind = kind
+        self.scale = scale
+        self.path = path
+        self.fd = fd
+        # Block device behind a drivetemp chip, so spun-down drives can be skipped
+        self.device = device
+
+
+class HwmonRegistry:
+    """hwmon chips and their temp/fan/in inputs, discovered once and read directly.
+
+    Discovery walks /sys/class/hwmon and keeps every *_input file open; a tick
+    then costs one pread per input instead of psutil re-listing every chip and
+    re-reading labels and thresholds. Chips come and go rarely (drivers loading,
+    drives hot-plugged), so they are rediscovered every HWMON_REDISCOVER_INTERVAL
+    seconds or as soon as an input disappears.
+    """
+
+    def __init__(self, path=HWMON_PATH):
+        self.path = path
+        self.sensors = []
+        self.discovered_at = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def read_text(path):
+        try:
+            with open(path, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def close(self):
+        for sensor in self.sensors:
+            try:
+                os.close(sensor.fd)
+            except OSError:
+                pass
+        self.sensors = []
+
+    def discover(self):
+        self.close()
+        self.discovered_at = time.monotonic()
+        try:
+            chips = sorted(os.listdir(self.path))
+        except OSError:
+            return
+
+        for chip_dir in chips:
+            base = os.path.join(self.path, chip_dir)
+            chip = self.read_text(os.path.join(base, "name")) or chip_dir
+            device = None
+            if chip == "drivetemp":
+                try:
+                    device = os.listdir(os.path.join(base, "device", "block"))[0]
+                except (OSError, IndexError):
+                    pass
+            # Older drivers keep their inputs on the device rather than the hwmon node
+            for directory in (base, os.path.join(base, "device")):
+                try:
+                    entries = sorted(os.listdir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    match = hwmon_input_pattern.match(entry)
+                    if not match:
+                        continue
+                    prefix = match.group(1) + match.group(2)
+                    kind, scale = HWMON_KINDS[match.group(1)]
+                    path = os.path.join(directory, entry)
+                    try:
+                        fd = os.open(path, os.O_RDONLY)
+                    except OSError:
+                        continue
+                    label = self.read_text(os.path.join(directory, prefix + "_label")) or prefix
+                    self.sensors.append(HwmonSensor(chip, label, kind, scale, path, fd, device))
+
+    def read(self, kind=None, chips=None, skip_devices=()):
+        """Current (sensor, value) pairs, optionally only of one kind or some chips.
+
+        Drive sensors whose block device is in skip_devices are not read at all;
+        asking a spun-down drive for its temperature would wake it up.
+        """
+        with self.lock:
+            if (
+                self.discovered_at is None
+                or time.monotonic() - self.discovered_at > HWMON_REDISCOVER_INTERVAL
+            ):
+                self.discover()
+
+            readings = []
+            vanished = False
+            for sensor in self.sensors:
+                if (kind and sensor.kind != kind) or (chips and sensor.chip not in chips):
+                    continue
+                if sensor.device and sensor.device in skip_devices:
+                    continue
+                try:
+                    raw = os.pread(sensor.fd, 32, 0)
+                    readings.append((sensor, int(raw) / sensor.scale))
+                except ValueError:
+                    continue
+                except OSError as e:
+                    # ENODATA/EAGAIN are sensors without a reading right now; anything
+                    # else means the chip went away
+                    if e.errno not in (errno.ENODATA, errno.EAGAIN, errno.EIO):
+                        vanished = True
+            if vanished:
+                self.discovered_at = None
+            return readings
+
+
+hwmon = HwmonRegistry()
+
+
 def get_cpu_temperature():
     try:
-        if hasattr(psutil, "sensors_temperatures"):
-            temps = psutil.sensors_temperatures()
-            for sensor in ["coretemp", "k10temp", "zenpower"]:
-                if sensor in temps:
-                    return max(
-                        [
-                            temp.current
-                            for temp in temps[sensor]
-                            if temp.current is not None
-                        ]
-                    )
+        readings = hwmon.read("temperatures", ("coretemp", "k10temp", "zenpower"))
+        for sensor in ["coretemp", "k10temp", "zenpower"]:
+            values = [value for chip_sensor, value in readings if chip_sensor.chip == sensor]
+            if values:
+                return max(values)
         return None
     except:
         return None
@@ -113,11 +318,17 @@ def get_memory_info():
         # System = Buffers + Cached + SReclaimable
         system_mem = buffers + cached + sreclaimable
 
-        # Docker memory approximation (part of slab memory)
-        docker_mem = slab * 0.5  # Estimate 50% of slab is Docker
+        # Docker and VM memory from their cgroups when those have been read
+        cgroup_totals = container_stats.memory_totals()
+        if cgroup_totals:
+            docker_mem = cgroup_totals["docker"]
+            vm_mem = cgroup_totals["vm"]
+        else:
+            # Docker memory approximation (part of slab memory)
+            docker_mem = slab * 0.5  # Estimate 50% of slab is Docker
 
-        # VM memory approximation (shared memory + some buffer)
-        vm_mem = shmem * 1.5  # Estimate VM memory
+            # VM memory approximation (shared memory + some buffer)
+            vm_mem = shmem * 1.5  # Estimate VM memory
 
         # Free memory
         actual_free = mem_free + buffers + cached + sreclaimable
@@ -152,83 +363,630 @@ def get_memory_info():
         return {"error": str(e)}
 
 
-def get_host_disk_usage(path):
-    """Get disk usage from host filesystem using df"""
-    try:
-        # Use absolute path to ensure we're checking the host mount
-        result = subprocess.run(
-            ["df", "-B1", path], capture_output=True, text=True, timeout=5
-        )
+HOST_CGROUP_PATH = "/host/sys/fs/cgroup"
+HOST_DOCKER_CONTAINERS_PATH = "/host/var/lib/docker/containers"
+CGROUP_RESCAN_INTERVAL = 30
 
-        if result.returncode == 0:
-            lines = result.stdout.strip().split("\n")
-            if len(lines) > 1:
-                parts = lines[1].split()
-                if len(parts) >= 4:
-                    return {
-                        "total": int(parts[1]),
-                        "used": int(parts[2]),
-                        "available": int(parts[3]),
-                        "percent": (int(parts[2]) / int(parts[1])) * 100
-                        if int(parts[1]) > 0
-                        else 0,
-                    }
+# Parent directories that hold container and VM cgroups, for the cgroupfs and
+# systemd drivers of Docker and libvirt
+CGROUP_PARENTS = ("docker", "system.slice", "machine", "machine.slice")
+docker_cgroup_pattern = re.compile(r"^(?:docker-)?([0-9a-f]{64})(?:\.scope)?$")
+vm_cgroup_pattern = re.compile(r"qemu-\d+-(.+?)(?:\.libvirt-qemu|\.scope)?$")
+
+
+class CgroupStats:
+    """Per-container and per-VM CPU, memory and I/O read from cgroupfs (v1 or v2).
+
+    The list of container cgroups is only rebuilt when one of the parent
+    directories changes or every CGROUP_RESCAN_INTERVAL seconds, so a tick
+    reads a handful of files per container and never walks the tree.
+    """
+
+    def __init__(self, root=HOST_CGROUP_PATH):
+        self.root = root
+        self.version = None
+        self.groups = {}
+        self.parent_mtimes = None
+        self.scanned_at = 0
+        self.previous = {}
+        self.names = {}
+        self.totals = None
+
+    def parent_dirs(self):
+        """Directories to list: the unified root on v2, the cpu controller on v1"""
+        if self.version == 2:
+            bases = [self.root]
+        else:
+            bases = [
+                os.path.join(self.root, controller)
+                for controller in ("cpu,cpuacct", "cpuacct", "cpu")
+                if os.path.isdir(os.path.join(self.root, controller))
+            ][:1]
+        return [os.path.join(base, parent) for base in bases for parent in CGROUP_PARENTS]
+
+    def controller_path(self, controller, relative):
+        if self.version == 2:
+            return os.path.join(self.root, relative)
+        for name in (controller, f"cpu,{controller}", f"{controller},cpu"):
+            path = os.path.join(self.root, name, relative)
+            if os.path.isdir(path):
+                return path
         return None
+
+    def docker_name(self, container_id):
+        """The container's name from its Docker config, else its short id.
+
+        /var/lib/docker/containers is usually readable by root only, so a failed
+        lookup is not remembered and is tried again on the next rescan.
+        """
+        name = self.names.get(container_id)
+        if name is None:
+            try:
+                path = os.path.join(HOST_DOCKER_CONTAINERS_PATH, container_id, "config.v2.json")
+                with open(path, "r") as f:
+                    name = json.load(f).get("Name", "").lstrip("/")
+            except (OSError, ValueError):
+                pass
+            if not name:
+                return container_id[:12]
+            self.names[container_id] = name
+        return name
+
+    def rescan(self):
+        """Rebuild the container list if the cgroup parents changed"""
+        if self.version is None:
+            self.version = 2 if os.path.exists(os.path.join(self.root, "cgroup.controllers")) else 1
+
+        parents = self.parent_dirs()
+        mtimes = []
+        for parent in parents:
+            try:
+                mtimes.append(os.stat(parent).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        if mtimes == self.parent_mtimes and time.monotonic() - self.scanned_at < CGROUP_RESCAN_INTERVAL:
+            return
+        self.parent_mtimes = mtimes
+        self.scanned_at = time.monotonic()
+
+        groups = {}
+        for parent in parents:
+            try:
+                children = os.listdir(parent)
+            except OSError:
+                continue
+            relative_parent = os.path.basename(parent)
+            for child in children:
+                docker = docker_cgroup_pattern.match(child)
+                vm = None if docker else vm_cgroup_pattern.search(child.replace("\\x2d", "-"))
+                if docker:
+                    key, kind, name = docker.group(1), "docker", self.docker_name(docker.group(1))
+                elif vm:
+                    key, kind, name = child, "vm", vm.group(1)
+                else:
+                    continue
+                groups[key] = {
+                    "kind": kind,
+                    "name": name,
+                    "relative": os.path.join(relative_parent, child),
+                }
+        self.groups = groups
+        self.previous = {key: value for key, value in self.previous.items() if key in groups}
+        self.names = {key: value for key, value in self.names.items() if key in groups}
+
+    @staticmethod
+    def read_value(path):
+        try:
+            with open(path, "r") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def read_counters(self, relative):
+        """(cpu seconds, memory current, memory peak, read bytes, write bytes)"""
+        cpu = memory = peak = None
+        read_bytes = write_bytes = 0
+
+        if self.version == 2:
+            base = os.path.join(self.root, relative)
+            stat = self.read_value(os.path.join(base, "cpu.stat")) or ""
+            for line in stat.splitlines():
+                if line.startswith("usage_usec "):
+                    cpu = int(line.split()[1]) / 1e6
+            memory = self.read_value(os.path.join(base, "memory.current"))
+            peak = self.read_value(os.path.join(base, "memory.peak"))
+            for line in (self.read_value(os.path.join(base, "io.stat")) or "").splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        read_bytes += int(value)
+                    elif key == "wbytes":
+                        write_bytes += int(value)
+        else:
+            cpu_path = self.controller_path("cpuacct", relative)
+            usage = self.read_value(os.path.join(cpu_path, "cpuacct.usage")) if cpu_path else None
+            cpu = int(usage) / 1e9 if usage else None
+            memory_path = self.controller_path("memory", relative)
+            if memory_path:
+                memory = self.read_value(os.path.join(memory_path, "memory.usage_in_bytes"))
+                peak = self.read_value(os.path.join(memory_path, "memory.max_usage_in_bytes"))
+            blkio_path = self.controller_path("blkio", relative)
+            if blkio_path:
+                service = self.read_value(os.path.join(blkio_path, "blkio.throttle.io_service_bytes"))
+                for line in (service or "").splitlines():
+                    parts = line.split()
+                    if len(parts) == 3 and parts[1] == "Read":
+                        read_bytes += int(parts[2])
+                    elif len(parts) == 3 and parts[1] == "Write":
+                        write_bytes += int(parts[2])
+
+        to_int = lambda value: int(value) if value and value.strip().isdigit() else None
+        return cpu, to_int(memory), to_int(peak), read_bytes, write_bytes
+
+    def collect(self):
+        if not os.path.isdir(self.root):
+            self.totals = None
+            return []
+        self.rescan()
+
+        now = time.monotonic()
+        containers = []
+        totals = {"docker": 0, "vm": 0}
+        for key, group in self.groups.items():
+            counters = self.read_counters(group["relative"])
+            cpu, memory, peak, read_bytes, write_bytes = counters
+            previous = self.previous.get(key)
+            self.previous[key] = (now, counters)
+
+            cpu_percent = read_rate = write_rate = None
+            if previous is not None and now > previous[0]:
+                elapsed = now - previous[0]
+                if cpu is not None and previous[1][0] is not None:
+                    cpu_percent = round(max(cpu - previous[1][0], 0) / elapsed * 100, 1)
+                read_rate = max(read_bytes - previous[1][3], 0) / elapsed
+                write_rate = max(write_bytes - previous[1][4], 0) / elapsed
+
+            totals[group["kind"]] += memory or 0
+            containers.append(
+                {
+                    "id": key[:12] if group["kind"] == "docker" else key,
+                    "name": group["name"],
+                    "type": group["kind"],
+                    "cpu_percent": cpu_percent,
+                    "memory_current": memory,
+                    "memory_peak": peak,
+                    "io_read_rate": read_rate,
+                    "io_write_rate": write_rate,
+                }
+            )
+
+        self.totals = totals if containers else None
+        containers.sort(key=lambda container: container["name"].lower())
+        return containers
+
+    def memory_totals(self):
+        """Memory of all Docker containers and all VMs as of the last collect()"""
+        return self.totals
+
+
+container_stats = CgroupStats()
+
+
+def get_container_stats():
+    try:
+        return container_stats.collect()
     except Exception as e:
-        print(f"Error getting disk usage for {path}: {e}")
+        print(f"Error getting container stats: {e}")
+        return {"error": "Container stats unavailable"}
+
+
+class IsolatedCalls:
+    """Runs calls that may block in the kernel on their own daemon threads.
+
+    A stale network mount or a wedged nvidia-smi can hold a thread for as long
+    as it likes, so the caller only waits up to a deadline. Such a thread cannot
+    be cancelled; while a call for a key is still outstanding, later calls for
+    the same key wait on it rather than starting another, so one hung mount
+    costs one thread and not one per tick.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def call(self, key, timeout, func, *args):
+        """Return func(*args), raising concurrent.futures.TimeoutError past the deadline"""
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = concurrent.futures.Future()
+                self.pending[key] = future
+                threading.Thread(
+                    target=self._run, args=(key, future, func, args), name=f"isolated-{key}", daemon=True
+                ).start()
+        return future.result(timeout)
+
+    def pending_call(self, key):
+        """Whether a call for key is still outstanding (e.g. hung in the kernel)"""
+        with self.lock:
+            return key in self.pending
+
+    def _run(self, key, future, func, args):
+        try:
+            result = func(*args)
+        except BaseException as e:
+            with self.lock:
+                self.pending.pop(key, None)
+            future.set_exception(e)
+        else:
+            with self.lock:
+                self.pending.pop(key, None)
+            future.set_result(result)
+
+
+isolated_calls = IsolatedCalls()
+
+
+# Unraid's emhttp keeps the array state in small .ini files it rewrites now and
+# then; they are re-parsed only when their mtime or size changes
+EMHTTP_PATH = "/host/var/local/emhttp"
+
+
+class IniFile:
+    """An emhttp .ini file, parsed again only when its mtime or size changes.
+
+    Keys before the first [section] (all of var.ini) land in the "" section.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = None
+        self.sections = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def parse(content):
+        sections = {"": {}}
+        current = sections[""]
+        for line in content.splitlines():
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                current = sections.setdefault(line[1:-1].strip('"'), {})
+            elif "=" in line:
+                key, value = line.split("=", 1)
+                current[key.strip()] = value.strip().strip('"')
+        return sections
+
+    def get(self):
+        """Return (signature, sections); the signature changes whenever the file does"""
+        with self.lock:
+            try:
+                stats = os.stat(self.path)
+            except OSError:
+                self.signature, self.sections = None, {}
+                return self.signature, self.sections
+
+            signature = (stats.st_mtime_ns, stats.st_size)
+            if signature != self.signature:
+                try:
+                    with open(self.path, "r") as f:
+                        self.sections = self.parse(f.read())
+                    self.signature = signature
+                except OSError as e:
+                    print(f"Error reading {self.path}: {e}")
+            return self.signature, self.sections
+
+
+def ini_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class EmhttpState:
+    """Disk table and array status from emhttp's disks.ini and var.ini.
+
+    Everything here comes from files emhttp already maintains, so reading it
+    never wakes a spun-down drive; other collectors use it to avoid touching
+    those drives themselves.
+    """
+
+    def __init__(self, path=EMHTTP_PATH):
+        self.disks_ini = IniFile(os.path.join(path, "disks.ini"))
+        self.var_ini = IniFile(os.path.join(path, "var.ini"))
+        self.disks_signature = None
+        self.disk_table = []
+        self.array_signature = None
+        self.array_status = None
+
+    @staticmethod
+    def parse_disk(name, fields):
+        temp = ini_int(fields.get("temp"), None)
+        return {
+            "name": name,
+            "device": fields.get("device") or None,
+            "id": fields.get("id") or None,
+            "type": fields.get("type") or None,
+            "status": fields.get("status") or None,
+            "color": fields.get("color") or None,
+            "rotational": fields.get("rotational") == "1",
+            "spun_down": fields.get("spundown") == "1",
+            # "*" while spun down, and the odd bogus value from a bad controller
+            "temp": temp if temp is not None and 10 <= temp <= 100 else None,
+            "size": ini_int(fields.get("size")) * 1024,
+            "reads": ini_int(fields.get("numReads")),
+            "writes": ini_int(fields.get("numWrites")),
+            "errors": ini_int(fields.get("numErrors")),
+            "fs_type": fields.get("fsType") or None,
+            "fs_status": fields.get("fsStatus") or None,
+            "fs_size": ini_int(fields.get("fsSize")) * 1024,
+            "fs_used": ini_int(fields.get("fsUsed")) * 1024,
+            "fs_free": ini_int(fields.get("fsFree")) * 1024,
+        }
+
+    def disks(self):
+        signature, sections = self.disks_ini.get()
+        if signature != self.disks_signature:
+            self.disk_table = [
+                self.parse_disk(name, fields)
+                for name, fields in sections.items()
+                if name and fields.get("status") != "DISK_NP"
+            ]
+            self.disks_signature = signature
+        return self.disk_table
+
+    def disk(self, name):
+        for disk in self.disks():
+            if disk["name"] == name:
+                return disk
         return None
 
+    def spun_down_devices(self):
+        return {disk["device"] for disk in self.disks() if disk["spun_down"] and disk["device"]}
+
+    def spun_down_usage(self, name):
+        """Usage of a spun-down array disk or pool as emhttp last recorded it, else None"""
+        disk = self.disk(name)
+        if not disk or not disk["spun_down"] or disk["fs_size"] <= 0:
+            return None
+        return {
+            "total": disk["fs_size"],
+            "used": disk["fs_used"],
+            "available": disk["fs_free"],
+            "percent": disk["fs_used"] / disk["fs_size"] * 100,
+        }
+
+    def array(self):
+        signature, sections = self.var_ini.get()
+        if signature != self.array_signature:
+            self.array_status = self.parse_array(sections.get("", {})) if signature else None
+            self.array_signature = signature
+        return self.array_status
+
+    @staticmethod
+    def parse_array(var):
+        size = ini_int(var.get("mdResync"))
+        position = ini_int(var.get("mdResyncPos"))
+        elapsed = ini_int(var.get("mdResyncDt"))
+        return {
+            "state": var.get("mdState") or None,
+            "num_disks": ini_int(var.get("mdNumDisks")),
+            "num_disabled": ini_int(var.get("mdNumDisabled")),
+            "num_invalid": ini_int(var.get("mdNumInvalid")),
+            "num_missing": ini_int(var.get("mdNumMissing")),
+            "parity": {
+                "running": size > 0,
+                "action": var.get("mdResyncAction") or None,
+                "position": position * 1024,
+                "size": size * 1024,
+                "progress": round(position / size * 100, 1) if size > 0 else None,
+                # Blocks done over the last interval emhttp measured, in KiB
+                "speed": ini_int(var.get("mdResyncDb")) * 1024 / elapsed if elapsed > 0 else 0,
+                "last_check": ini_int(var.get("sbSynced"), None),
+                "last_errors": ini_int(var.get("sbSyncErrs"), None),
+                "last_exit": ini_int(var.get("sbSyncExit"), None),
+            },
+        }
+
+
+emhttp = EmhttpState()
 
-def get_host_filesystem_type(path):
-    """Get filesystem type from host"""
+
+def get_array_info():
+    """Unraid array status, parity check progress and the disk table"""
     try:
-        result = subprocess.run(
-            ["df", "-T", path], capture_output=True, text=True, timeout=5
-        )
+        if not os.path.exists(EMHTTP_PATH):
+            return {"error": "Unraid array state not available"}
+        return {"array": emhttp.array(), "disks": emhttp.disks()}
+    except Exception as e:
+        print(f"Error getting array info: {e}")
+        return {"error": str(e)}
 
-        if result.returncode == 0:
-            lines = result.stdout.strip().split("\n")
-            if len(lines) > 1:
-                parts = lines[1].split()
-                if len(parts) >= 2:
-                    return parts[1].lower()
-        return "unknown"
-    except:
+
+HOST_MNT_PATH = "/host/mnt"
+HOST_MOUNTS_PATH = "/host/proc/mounts"
+MOUNT_TABLE_MAX_AGE = 60
+STATVFS_DEADLINE = 2
+# A mount that keeps timing out is reported at most once a minute
+STATVFS_LOG_INTERVAL = 60
+
+
+class MountTable:
+    """Parsed mount table that is only re-read when the mounts change.
+
+    The kernel flags a mount change on an open /proc/*/mounts file through
+    poll() (POLLERR/POLLPRI); if polling is not possible the table is simply
+    re-read every MOUNT_TABLE_MAX_AGE seconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.poller = None
+        self.loaded_at = 0
+        self.mounts = {}
+        self.fstype_cache = {}
+        self.lock = threading.Lock()
+
+    def _changed(self):
+        if self.fd is None:
+            return True
+        if self.poller is not None:
+            return bool(self.poller.poll(0))
+        return time.monotonic() - self.loaded_at > MOUNT_TABLE_MAX_AGE
+
+    def _load(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+        # Keep the file open: the change notification is tied to this descriptor
+        fd = os.open(self.path, os.O_RDONLY)
+        chunks = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        mounts = {}
+        for line in b"".join(chunks).decode(errors="replace").splitlines():
+            parts = line.split()
+            if len(parts) >= 3:
+                # Spaces and tabs in mount points are octal-escaped (\040)
+                mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), parts[1])
+                mounts[mount_point] = parts[2]
+
+        try:
+            self.poller = select.poll()
+            self.poller.register(fd, select.POLLERR | select.POLLPRI)
+        except (AttributeError, OSError):
+            self.poller = None
+        self.fd = fd
+        self.mounts = mounts
+        self.fstype_cache = {}
+        self.loaded_at = time.monotonic()
+
+    def get(self):
+        """Mount point -> filesystem type"""
+        with self.lock:
+            if self._changed():
+                self._load()
+            return self.mounts
+
+    def fstype(self, *paths):
+        """Filesystem type of the deepest mount containing any of the given paths"""
+        mounts = self.get()
+        key = paths
+        if key in self.fstype_cache:
+            return self.fstype_cache[key]
+
+        best, best_length = "unknown", -1
+        for path in paths:
+            for mount_point, fs_type in mounts.items():
+                prefix = mount_point.rstrip("/") + "/"
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) > best_length:
+                    best, best_length = fs_type.lower(), len(mount_point)
+        self.fstype_cache[key] = best
+        return best
+
+
+mount_table = MountTable(HOST_MOUNTS_PATH)
+
+
+last_disk_usage = {}
+disk_usage_logged_at = {}
+
+
+def get_host_disk_usage(path):
+    """Get disk usage of a host filesystem with statvfs (same numbers as df).
+
+    statvfs runs under a deadline; a mount that does not answer in time reports
+    its last known usage marked stale. While that statvfs is still hung, later
+    calls report the stale usage straight away instead of waiting again.
+    """
+    key = ("statvfs", path)
+    try:
+        if isolated_calls.pending_call(key):
+            raise concurrent.futures.TimeoutError()
+        stats = isolated_calls.call(key, STATVFS_DEADLINE, os.statvfs, path)
+    except concurrent.futures.TimeoutError:
+        now = time.monotonic()
+        logged_at = disk_usage_logged_at.get(path)
+        if logged_at is None or now - logged_at >= STATVFS_LOG_INTERVAL:
+            disk_usage_logged_at[path] = now
+            print(f"Disk usage for {path} timed out after {STATVFS_DEADLINE}s")
+        usage = last_disk_usage.get(path)
+        return dict(usage, stale=True) if usage else None
+    except Exception as e:
+        print(f"Error getting disk usage for {path}: {e}")
+        return None
+
+    total = stats.f_blocks * stats.f_frsize
+    used = (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+    usage = {
+        "total": total,
+        "used": used,
+        "available": stats.f_bavail * stats.f_frsize,
+        "percent": (used / total) * 100 if total > 0 else 0,
+    }
+    last_disk_usage[path] = usage
+    disk_usage_logged_at.pop(path, None)
+    return usage
+
+
+def get_host_filesystem_type(path, host_path=None):
+    """Get filesystem type from the host mount table"""
+    try:
+        if host_path:
+            return mount_table.fstype(path, host_path)
+        return mount_table.fstype(path)
+    except Exception:
         return "unknown"
 
 
-def is_valid_storage_pool(path, name):
-    """Check if this is a valid storage pool (not system directory)"""
-    # Exclude system directories and small partitions
-    excluded_dirs = [
-        "user0",
-        "disks",
-        "remotes",
-        "addons",
-        "plugins",
-        "appdata",
-        "domains",
-        "system",
-        "libvirt",
-    ]
+EXCLUDED_POOL_DIRS = {
+    "user0",
+    "disks",
+    "remotes",
+    "addons",
+    "plugins",
+    "appdata",
+    "domains",
+    "system",
+    "libvirt",
+}
+
 
-    if name.startswith(".") or name in excluded_dirs:
+def is_storage_pool_name(name):
+    """Exclude system directories before touching the filesystem at all"""
+    return not name.startswith(".") and name not in EXCLUDED_POOL_DIRS
+
+
+def is_valid_storage_pool(name, usage):
+    """Check if this is a valid storage pool (not system directory)"""
+    if not is_storage_pool_name(name):
         return False
 
     # Check if it's a reasonable size for a storage pool (> 1GB)
-    try:
-        usage = get_host_disk_usage(path)
-        if usage and usage["total"] < 1000000000:  # Less than 1GB
-            return False
-        return True
-    except:
+    if usage and usage["total"] < 1000000000:  # Less than 1GB
         return False
+    return True
+
+
+def get_pool_display_name(name):
+    if name == "cache":
+        return "Cache Pool"
+    elif name.startswith("disk"):
+        return f'Disk {name.replace("disk", "")}'
+    return name.capitalize()
 
 
 def get_pools_info():
     try:
         pools_info = []
-        host_mnt_path = "/host/mnt"
+        host_mnt_path = HOST_MNT_PATH
 
         if os.path.exists(host_mnt_path):
             try:
@@ -237,98 +995,82 @@ def get_pools_info():
                     mount_path = os.path.join(host_mnt_path, item)
 
                     # Check if it's a directory and potentially a storage pool
-                    if os.path.isdir(mount_path) and is_valid_storage_pool(
-                        mount_path, item
-                    ):
-                        try:
-                            disk_usage = get_host_disk_usage(mount_path)
-                            if disk_usage and disk_usage["total"] > 0:
-                                fs_type = get_host_filesystem_type(mount_path)
-
-                                # Get friendly name
-                                if item == "cache":
-                                    pool_name = "Cache Pool"
-                                elif item.startswith("disk"):
-                                    pool_name = f'Disk {item.replace("disk", "")}'
-                                else:
-                                    pool_name = item.capitalize()
+                    if not is_storage_pool_name(item) or not os.path.isdir(mount_path):
+                        continue
+
+                    try:
+                        # Spun-down drives are left alone: emhttp has their usage
+                        disk_usage = emhttp.spun_down_usage(item) or get_host_disk_usage(mount_path)
+                        if (
+                            is_valid_storage_pool(item, disk_usage)
+                            and disk_usage
+                            and disk_usage["total"] > 0
+                        ):
+                            pools_info.append(
+                                {
+                                    "name": get_pool_display_name(item),
+                                    "mountpoint": f"/mnt/{item}",
+                                    "fstype": get_host_filesystem_type(
+                                        mount_path, f"/mnt/{item}"
+                                    ),
+                                    "total": disk_usage["total"],
+                                    "used": disk_usage["used"],
+                                    "free": disk_usage["available"],
+                                    "percent": disk_usage["percent"],
+                                    "stale": disk_usage.get("stale", False),
+                                }
+                            )
+
+                    except (PermissionError, FileNotFoundError, OSError) as e:
+                        print(f"Error processing {mount_path}: {e}")
+                        continue
+            except (PermissionError, OSError) as e:
+                print(f"Error reading host mnt directory: {e}")
 
+        # If no pools found in /host/mnt, try to detect from host's mounted filesystems
+        if not pools_info:
+            try:
+                if os.path.exists(HOST_MOUNTS_PATH):
+                    for mount_point, fs_type in mount_table.get().items():
+                        # Look for storage-like mount points
+                        if (
+                            mount_point.startswith("/mnt/")
+                            and not any(
+                                x in mount_point
+                                for x in [
+                                    "/mnt/user0",
+                                    "/mnt/disks",
+                                    "/mnt/remotes",
+                                ]
+                            )
+                            and fs_type
+                            not in [
+                                "autofs",
+                                "tmpfs",
+                                "devtmpfs",
+                                "sysfs",
+                                "proc",
+                            ]
+                        ):
+
+                            disk_usage = get_host_disk_usage(mount_point)
+                            if (
+                                disk_usage and disk_usage["total"] > 1000000000
+                            ):  # >1GB
                                 pools_info.append(
                                     {
-                                        "name": pool_name,
-                                        "mountpoint": f"/mnt/{item}",
+                                        "name": get_pool_display_name(
+                                            os.path.basename(mount_point)
+                                        ),
+                                        "mountpoint": mount_point,
                                         "fstype": fs_type,
                                         "total": disk_usage["total"],
                                         "used": disk_usage["used"],
                                         "free": disk_usage["available"],
                                         "percent": disk_usage["percent"],
+                                        "stale": disk_usage.get("stale", False),
                                     }
                                 )
-
-                        except (PermissionError, FileNotFoundError, OSError) as e:
-                            print(f"Error processing {mount_path}: {e}")
-                            continue
-            except (PermissionError, OSError) as e:
-                print(f"Error reading host mnt directory: {e}")
-
-        # If no pools found in /host/mnt, try to detect from host's mounted filesystems
-        if not pools_info:
-            try:
-                # Read host's mounted filesystems by checking /host/proc/mounts
-                if os.path.exists("/host/proc/mounts"):
-                    with open("/host/proc/mounts", "r") as f:
-                        for line in f:
-                            parts = line.split()
-                            if len(parts) >= 3:
-                                mount_point = parts[1]
-                                fs_type = parts[2]
-
-                                # Look for storage-like mount points
-                                if (
-                                    mount_point.startswith("/mnt/")
-                                    and not any(
-                                        x in mount_point
-                                        for x in [
-                                            "/mnt/user0",
-                                            "/mnt/disks",
-                                            "/mnt/remotes",
-                                        ]
-                                    )
-                                    and fs_type
-                                    not in [
-                                        "autofs",
-                                        "tmpfs",
-                                        "devtmpfs",
-                                        "sysfs",
-                                        "proc",
-                                    ]
-                                ):
-
-                                    disk_usage = get_host_disk_usage(mount_point)
-                                    if (
-                                        disk_usage and disk_usage["total"] > 1000000000
-                                    ):  # >1GB
-                                        pool_name = os.path.basename(mount_point)
-                                        if pool_name == "cache":
-                                            pool_name = "Cache Pool"
-                                        elif pool_name.startswith("disk"):
-                                            pool_name = (
-                                                f'Disk {pool_name.replace("disk", "")}'
-                                            )
-                                        else:
-                                            pool_name = pool_name.capitalize()
-
-                                        pools_info.append(
-                                            {
-                                                "name": pool_name,
-                                                "mountpoint": mount_point,
-                                                "fstype": fs_type,
-                                                "total": disk_usage["total"],
-                                                "used": disk_usage["used"],
-                                                "free": disk_usage["available"],
-                                                "percent": disk_usage["percent"],
-                                            }
-                                        )
             except Exception as e:
                 print(f"Error reading host mounts: {e}")
 
@@ -338,126 +1080,189 @@ def get_pools_info():
         return {"error": str(e)}
 
 
-def get_gpu_info():
-    try:
-        # Use the simple query that was working before
+# Child processes started per command, reported on /api/debug/collectors
+subprocess_spawns = collections.Counter()
+subprocess_spawns_lock = threading.Lock()
+
+
+def count_spawn(command):
+    with subprocess_spawns_lock:
+        subprocess_spawns[os.path.basename(command)] += 1
+
+
+# GPU collection goes through a backend so nvidia-smi is spawned once per sample
+# ("query") or kept running and read as it streams ("loop"). NVIDIA_SMI may point
+# at any script that speaks the same CSV, which is how it is tested without a GPU.
+NVIDIA_SMI = os.environ.get("NVIDIA_SMI", "nvidia-smi")
+GPU_BACKEND = os.environ.get("GPU_BACKEND", "query")
+GPU_LOOP_INTERVAL_MS = 2000
+GPU_APPS_INTERVAL = 10
+GPU_RETRY_INTERVAL = 60
+
+GPU_FIELDS = (
+    ("name", "name"),
+    ("temperature", "temperature.gpu"),
+    ("utilization", "utilization.gpu"),
+    ("memory_total", "memory.total"),
+    ("memory_used", "memory.used"),
+    ("memory_free", "memory.free"),
+    ("memory_utilization", "utilization.memory"),
+    ("driver_version", "driver_version"),
+    ("pci_bus", "pci.bus_id"),
+    ("clock_graphics", "clocks.gr"),
+    ("clock_memory", "clocks.mem"),
+    ("power_draw", "power.draw"),
+    ("power_limit", "power.limit"),
+)
+GPU_TEXT_FIELDS = {"name", "driver_version", "pci_bus"}
+GPU_QUERY_ARGS = [
+    "--query-gpu=" + ",".join(field for _, field in GPU_FIELDS),
+    "--format=csv,noheader,nounits",
+]
+
+
+def parse_gpu_line(line):
+    """One CSV row of GPU_FIELDS; unsupported values ([N/A]) become None"""
+    parts = [part.strip() for part in line.split(",")]
+    if len(parts) != len(GPU_FIELDS):
+        return None
+
+    gpu = {}
+    for (key, _), value in zip(GPU_FIELDS, parts):
+        if key in GPU_TEXT_FIELDS:
+            gpu[key] = value
+        else:
+            try:
+                gpu[key] = float(value)
+            except ValueError:
+                gpu[key] = None
+    return gpu
+
+
+class NvidiaSmiQueryBackend:
+    """Runs nvidia-smi once for every GPU field and once for the compute apps"""
+
+    def __init__(self, command=NVIDIA_SMI):
+        self.command = command
+        self.missing_since = None
+
+    def available(self):
+        # Don't keep spawning a binary that isn't installed
+        if self.missing_since and time.monotonic() - self.missing_since < GPU_RETRY_INTERVAL:
+            return False
+        if shutil.which(self.command) is None:
+            self.missing_since = time.monotonic()
+            return False
+        self.missing_since = None
+        return True
+
+    def run(self, args, timeout=10):
+        count_spawn(self.command)
         result = subprocess.run(
-            [
-                "nvidia-smi",
-                "--query-gpu=name,temperature.gpu,utilization.gpu,memory.total,memory.used,memory.free,utilization.memory",
-                "--format=csv,noheader,nounits",
-            ],
-            capture_output=True,
+            [self.command] + args, capture_output=True, text=True, timeout=timeout
+        )
+        return result.stdout if result.returncode == 0 else None
+
+    def query_process_counts(self):
+        """Compute processes per PCI bus id"""
+        output = self.run(["--query-compute-apps=gpu_bus_id,pid", "--format=csv,noheader"], 5)
+        counts = {}
+        for line in (output or "").splitlines():
+            if line.strip():
+                bus_id = line.split(",")[0].strip()
+                counts[bus_id] = counts.get(bus_id, 0) + 1
+        return counts
+
+    def collect(self):
+        if not self.available():
+            return []
+        output = self.run(GPU_QUERY_ARGS)
+        if output is None:
+            return []
+
+        gpus = [gpu for gpu in map(parse_gpu_line, output.splitlines()) if gpu]
+        counts = self.query_process_counts()
+        for gpu in gpus:
+            gpu["process_count"] = counts.get(gpu["pci_bus"], 0)
+        return gpus
+
+
+class NvidiaSmiLoopBackend(NvidiaSmiQueryBackend):
+    """Keeps one `nvidia-smi -lms` child running and parses the rows it streams"""
+
+    def __init__(self, command=NVIDIA_SMI, interval_ms=GPU_LOOP_INTERVAL_MS):
+        super().__init__(command)
+        self.interval_ms = interval_ms
+        self.process = None
+        self.gpus = {}
+        self.process_counts = {}
+        self.counts_at = 0
+        self.lock = threading.Lock()
+
+    def _read(self, process):
+        for line in process.stdout:
+            gpu = parse_gpu_line(line)
+            if gpu:
+                gpu["updated"] = time.monotonic()
+                with self.lock:
+                    self.gpus[gpu["pci_bus"]] = gpu
+
+    def _ensure_running(self):
+        if self.process is not None and self.process.poll() is None:
+            return True
+        if not self.available():
+            return False
+
+        count_spawn(self.command)
+        self.process = subprocess.Popen(
+            [self.command] + GPU_QUERY_ARGS + [f"-lms={self.interval_ms}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
             text=True,
-            timeout=10,
+            bufsize=1,
         )
+        threading.Thread(
+            target=self._read, args=(self.process,), name="gpu-loop-reader", daemon=True
+        ).start()
+        return True
 
-        if result.returncode == 0:
-            gpus = []
-            for line in result.stdout.strip().split("\n"):
-                if line:
-                    parts = line.split(", ")
-                    if len(parts) >= 7:
-                        gpu_data = {
-                            "name": parts[0],
-                            "temperature": float(parts[1]),
-                            "utilization": float(parts[2]),
-                            "memory_total": float(parts[3]),
-                            "memory_used": float(parts[4]),
-                            "memory_free": float(parts[5]),
-                            "memory_utilization": float(parts[6]),
-                        }
-
-                        # Now add additional information with separate safe queries
-                        try:
-                            # Get driver version and PCI info
-                            info_result = subprocess.run(
-                                [
-                                    "nvidia-smi",
-                                    "--query-gpu=driver_version,pci.bus_id",
-                                    "--format=csv,noheader,nounits",
-                                ],
-                                capture_output=True,
-                                text=True,
-                                timeout=5,
-                            )
+    def collect(self):
+        if not self._ensure_running():
+            return []
 
-                            if info_result.returncode == 0:
-                                info_parts = info_result.stdout.strip().split(", ")
-                                if len(info_parts) >= 2:
-                                    gpu_data["driver_version"] = info_parts[0]
-                                    gpu_data["pci_bus"] = info_parts[1]
-                        except:
-                            pass
-
-                        # Get clock speeds
-                        try:
-                            clock_result = subprocess.run(
-                                [
-                                    "nvidia-smi",
-                                    "--query-gpu=clocks.gr,clocks.mem",
-                                    "--format=csv,noheader,nounits",
-                                ],
-                                capture_output=True,
-                                text=True,
-                                timeout=5,
-                            )
+        # Compute apps aren't part of the stream, refresh them on a slower schedule
+        if time.monotonic() - self.counts_at > GPU_APPS_INTERVAL:
+            self.counts_at = time.monotonic()
+            self.process_counts = self.query_process_counts()
 
-                            if clock_result.returncode == 0:
-                                clock_parts = clock_result.stdout.strip().split(", ")
-                                if len(clock_parts) >= 2:
-                                    gpu_data["clock_graphics"] = float(clock_parts[0])
-                                    gpu_data["clock_memory"] = float(clock_parts[1])
-                        except:
-                            pass
-
-                        # Get power information
-                        try:
-                            power_result = subprocess.run(
-                                [
-                                    "nvidia-smi",
-                                    "--query-gpu=power.draw,power.limit",
-                                    "--format=csv,noheader,nounits",
-                                ],
-                                capture_output=True,
-                                text=True,
-                                timeout=5,
-                            )
+        # GPUs that stopped reporting for a few intervals are dropped
+        expiry = time.monotonic() - 3 * self.interval_ms / 1000
+        with self.lock:
+            self.gpus = {bus: gpu for bus, gpu in self.gpus.items() if gpu["updated"] > expiry}
+            gpus = [dict(gpu) for gpu in self.gpus.values()]
 
-                            if power_result.returncode == 0:
-                                power_parts = power_result.stdout.strip().split(", ")
-                                if len(power_parts) >= 2:
-                                    gpu_data["power_draw"] = float(power_parts[0])
-                                    gpu_data["power_limit"] = float(power_parts[1])
-                        except:
-                            pass
-
-                        # Get process count
-                        try:
-                            process_result = subprocess.run(
-                                [
-                                    "nvidia-smi",
-                                    "--query-compute-apps=pid",
-                                    "--format=csv,noheader",
-                                ],
-                                capture_output=True,
-                                text=True,
-                                timeout=5,
-                            )
+        for gpu in gpus:
+            del gpu["updated"]
+            gpu["process_count"] = self.process_counts.get(gpu["pci_bus"], 0)
+        return gpus
 
-                            if process_result.returncode == 0:
-                                processes = process_result.stdout.strip().split("\n")
-                                gpu_data["process_count"] = len(
-                                    [p for p in processes if p.strip()]
-                                )
-                            else:
-                                gpu_data["process_count"] = 0
-                        except:
-                            gpu_data["process_count"] = 0
 
-                        gpus.append(gpu_data)
-            return gpus
+class NoGpuBackend:
+    def collect(self):
         return []
+
+
+GPU_BACKENDS = {
+    "query": NvidiaSmiQueryBackend,
+    "loop": NvidiaSmiLoopBackend,
+    "none": NoGpuBackend,
+}
+gpu_backend = GPU_BACKENDS.get(GPU_BACKEND, NvidiaSmiQueryBackend)()
+
+
+def get_gpu_info():
+    try:
+        return gpu_backend.collect()
     except (
         subprocess.TimeoutExpired,
         subprocess.CalledProcessError,
@@ -469,27 +1274,125 @@ def get_gpu_info():
         return []
 
 
+SYS_CLASS_NET_PATH = "/sys/class/net"
+NETWORK_INCLUDE_BONDS = os.environ.get("NETWORK_INCLUDE_BONDS", "false").lower() == "true"
+NETWORK_INCLUDE_BRIDGES = os.environ.get("NETWORK_INCLUDE_BRIDGES", "false").lower() == "true"
+NETWORK_RATE_FIELDS = (
+    ("bytes_sent", "sent_rate"),
+    ("bytes_recv", "recv_rate"),
+    ("packets_sent", "packets_sent_rate"),
+    ("packets_recv", "packets_recv_rate"),
+    ("errin", "errors_in_rate"),
+    ("errout", "errors_out_rate"),
+    ("dropin", "drops_in_rate"),
+    ("dropout", "drops_out_rate"),
+)
+
+
+def is_virtual_interface(interface):
+    """Docker/VM plumbing that never carries the host's own traffic"""
+    return (
+        interface.startswith("docker")
+        or interface.startswith("br-")
+        or interface.startswith("veth")
+        or interface == "lo"
+        or interface.startswith("virbr")
+    )
+
+
+class NetworkRates:
+    """Per-interface counter deltas, timed by the sampler rather than by requests"""
+
+    def __init__(self):
+        self.previous = None
+        self.previous_time = None
+        self.kinds = {}
+        self.known_interfaces = frozenset()
+
+    def interface_kind(self, interface):
+        kind = self.kinds.get(interface)
+        if kind is None:
+            base = os.path.join(SYS_CLASS_NET_PATH, interface)
+            if os.path.exists(os.path.join(base, "bonding")):
+                kind = "bond"
+            elif os.path.exists(os.path.join(base, "bridge")):
+                kind = "bridge"
+            elif os.path.exists(os.path.join(base, "device")):
+                kind = "physical"
+            else:
+                kind = "virtual"
+            self.kinds[interface] = kind
+        return kind
+
+    def is_listed(self, interface):
+        kind = self.interface_kind(interface)
+        return (
+            kind == "physical"
+            or (kind == "bond" and NETWORK_INCLUDE_BONDS)
+            or (kind == "bridge" and NETWORK_INCLUDE_BRIDGES)
+        )
+
+    def sample(self):
+        """Rates per interface since the previous call (zero on the first call)"""
+        counters = psutil.net_io_counters(pernic=True)
+        now = time.monotonic()
+        previous, elapsed = self.previous, None
+        if previous is not None and now > self.previous_time:
+            elapsed = now - self.previous_time
+        self.previous, self.previous_time = counters, now
+        # Kinds are looked up lazily for only some interfaces, so compare against
+        # the interfaces seen last time: one was added or removed, look them up again
+        interfaces = frozenset(counters)
+        if interfaces != self.known_interfaces:
+            self.known_interfaces = interfaces
+            self.kinds = {}
+
+        rates = {}
+        for interface, current in counters.items():
+            before = previous.get(interface) if previous else None
+            rates[interface] = {
+                rate: (
+                    max(getattr(current, field) - getattr(before, field), 0) / elapsed
+                    if before is not None and elapsed
+                    else 0.0
+                )
+                for field, rate in NETWORK_RATE_FIELDS
+            }
+        return rates
+
+
+network_rates = NetworkRates()
+
+
 def get_network_info():
     try:
         net_io = psutil.net_io_counters()
         net_if_addrs = psutil.net_if_addrs()
         net_if_stats = psutil.net_if_stats()
+        rates = network_rates.sample()
 
         # Find active physical interface (skip virtual/docker bridges)
         active_interface = None
+        interfaces = []
 
         for interface, addrs in net_if_addrs.items():
             # Skip virtual/docker interfaces
-            if (
-                interface.startswith("docker")
-                or interface.startswith("br-")
-                or interface.startswith("veth")
-                or interface == "lo"
-                or interface.startswith("virbr")
-            ):
+            if is_virtual_interface(interface):
                 continue
 
             stats = net_if_stats.get(interface)
+            if network_rates.is_listed(interface) and interface in rates:
+                interfaces.append(
+                    {
+                        "name": interface,
+                        "kind": network_rates.interface_kind(interface),
+                        "is_up": stats.isup if stats else False,
+                        "speed": stats.speed if stats else 0,
+                        "mtu": stats.mtu if stats else None,
+                        **rates[interface],
+                    }
+                )
+
             if stats and stats.isup:
                 ipv4_addrs = [
                     addr.address for addr in addrs if addr.family == socket.AF_INET
@@ -510,6 +1413,15 @@ def get_network_info():
                 ):
                     active_interface = interface_data
 
+        # Current speed is the active interface's, else the sum of the physical NICs
+        if active_interface and active_interface["name"] in rates:
+            current = rates[active_interface["name"]]
+            current_sent, current_recv = current["sent_rate"], current["recv_rate"]
+        else:
+            current_sent = sum(i["sent_rate"] for i in interfaces if i["kind"] == "physical")
+            current_recv = sum(i["recv_rate"] for i in interfaces if i["kind"] == "physical")
+
+        interfaces.sort(key=lambda i: i["name"])
         return {
             "bytes_sent": net_io.bytes_sent,
             "bytes_recv": net_io.bytes_recv,
@@ -520,8 +1432,9 @@ def get_network_info():
             "drops_in": net_io.dropin,
             "drops_out": net_io.dropout,
             "active_interface": active_interface,
-            "current_sent": 0,
-            "current_recv": 0,
+            "current_sent": current_sent,
+            "current_recv": current_recv,
+            "interfaces": interfaces,
         }
     except Exception as e:
         return {"error": str(e)}
@@ -587,46 +1500,127 @@ def format_speed(bytes_per_sec):
     return f"{bytes_per_sec:.2f} TB/s"
 
 
-def get_disk_io_info():
-    """Get disk I/O statistics with actual speed calculation"""
-    global prev_disk_io, prev_disk_io_time
+HOST_DISKSTATS_PATH = "/host/proc/diskstats"
+SYS_BLOCK_PATH = "/sys/block"
+DISKSTATS_SECTOR_SIZE = 512  # diskstats always counts 512-byte sectors
 
-    try:
-        disk_io = psutil.disk_io_counters()
-        current_time = time.time()
-
-        if disk_io and prev_disk_io and prev_disk_io_time:
-            time_diff = current_time - prev_disk_io_time
-            if time_diff > 0:
-                read_speed = (disk_io.read_bytes - prev_disk_io.read_bytes) / time_diff
-                write_speed = (
-                    disk_io.write_bytes - prev_disk_io.write_bytes
-                ) / time_diff
+# Used only when /sys/block is not readable to tell whole disks from partitions
+whole_disk_pattern = re.compile(r"^(sd[a-z]+|hd[a-z]+|vd[a-z]+|xvd[a-z]+|nvme\d+n\d+|mmcblk\d+|md\d+)$")
+
+
+class DiskStats:
+    """Per-device I/O rates from diskstats deltas between sampler ticks.
+
+    Only whole disks are reported (partitions would count the same I/O twice),
+    and loop, ram and zram devices are skipped. Reading diskstats never touches
+    the drives themselves, so spun-down disks stay asleep.
+    """
+
+    def __init__(self):
+        self.previous = None
+        self.previous_time = None
+        self.whole_disks = None
+        self.device_names = None
+
+    def diskstats_path(self):
+        return HOST_DISKSTATS_PATH if os.path.exists(HOST_DISKSTATS_PATH) else "/proc/diskstats"
+
+    def read_counters(self):
+        counters = {}
+        with open(self.diskstats_path(), "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 14:
+                    continue
+                # reads, sectors read, ms reading, writes, sectors written, ms writing, ms doing I/O
+                counters[parts[2]] = (
+                    int(parts[3]), int(parts[5]), int(parts[6]),
+                    int(parts[7]), int(parts[9]), int(parts[10]), int(parts[12]),
+                )
+        return counters
+
+    def is_whole_disk(self, name):
+        if name.startswith(("loop", "ram", "zram")):
+            return False
+        if self.whole_disks is not None:
+            return name in self.whole_disks
+        return whole_disk_pattern.match(name) is not None
+
+    def rescan(self, names):
+        """Re-read the block device list whenever a device appears or goes away"""
+        self.device_names = names
+        try:
+            self.whole_disks = set(os.listdir(SYS_BLOCK_PATH)) or None
+        except OSError:
+            self.whole_disks = None
+
+    def sample(self):
+        counters = self.read_counters()
+        now = time.monotonic()
+        names = frozenset(counters)
+        if names != self.device_names:
+            self.rescan(names)
+
+        previous, elapsed = self.previous, None
+        if previous is not None and now > self.previous_time:
+            elapsed = now - self.previous_time
+        self.previous, self.previous_time = counters, now
+
+        devices = []
+        totals = [0] * 7
+        for name, current in counters.items():
+            if not self.is_whole_disk(name):
+                continue
+            for i, value in enumerate(current):
+                totals[i] += value
+            before = previous.get(name) if previous else None
+            if before is None or not elapsed:
+                delta = (0,) * 7
             else:
-                read_speed = 0
-                write_speed = 0
-        else:
-            read_speed = 0
-            write_speed = 0
+                delta = tuple(max(c - b, 0) for c, b in zip(current, before))
+            reads, sectors_read, ms_reading, writes, sectors_written, ms_writing, ms_io = delta
+            ios = reads + writes
+            devices.append(
+                {
+                    "name": name,
+                    "read_rate": sectors_read * DISKSTATS_SECTOR_SIZE / elapsed if elapsed else 0.0,
+                    "write_rate": sectors_written * DISKSTATS_SECTOR_SIZE / elapsed if elapsed else 0.0,
+                    "read_iops": reads / elapsed if elapsed else 0.0,
+                    "write_iops": writes / elapsed if elapsed else 0.0,
+                    "await_ms": (ms_reading + ms_writing) / ios if ios else 0.0,
+                    "util_percent": min(ms_io / (elapsed * 1000) * 100, 100.0) if elapsed else 0.0,
+                }
+            )
+        devices.sort(key=lambda d: d["name"])
+        return devices, totals
 
-        # Update previous values
-        prev_disk_io = disk_io
-        prev_disk_io_time = current_time
 
-        if disk_io:
-            return {
-                "read_bytes": disk_io.read_bytes,
-                "write_bytes": disk_io.write_bytes,
-                "read_count": disk_io.read_count,
-                "write_count": disk_io.write_count,
-                "read_time": disk_io.read_time,
-                "write_time": disk_io.write_time,
-                "read_speed": read_speed,
-                "write_speed": write_speed,
-                "read_speed_formatted": format_speed(read_speed),
-                "write_speed_formatted": format_speed(write_speed),
-            }
-        return {"error": "No disk I/O counters available"}
+disk_stats = DiskStats()
+
+
+def get_disk_io_info():
+    """Get disk I/O statistics with actual speed calculation"""
+    try:
+        devices, totals = disk_stats.sample()
+        if not devices:
+            return {"error": "No disk I/O counters available"}
+
+        reads, sectors_read, ms_reading, writes, sectors_written, ms_writing, _ = totals
+        read_speed = sum(d["read_rate"] for d in devices)
+        write_speed = sum(d["write_rate"] for d in devices)
+        return {
+            "read_bytes": sectors_read * DISKSTATS_SECTOR_SIZE,
+            "write_bytes": sectors_written * DISKSTATS_SECTOR_SIZE,
+            "read_count": reads,
+            "write_count": writes,
+            "read_time": ms_reading,
+            "write_time": ms_writing,
+            "read_speed": read_speed,
+            "write_speed": write_speed,
+            "read_speed_formatted": format_speed(read_speed),
+            "write_speed_formatted": format_speed(write_speed),
+            "devices": devices,
+        }
     except Exception as e:
         print(f"Error getting disk I/O info: {e}")
         return {"error": "Disk I/O stats unavailable"}
@@ -635,7 +1629,9 @@ def get_disk_io_info():
 def get_temperature_info():
     """Get all available temperature sensors with friendly names"""
     try:
-        temps = psutil.sensors_temperatures()
+        temps = {}
+        for sensor, value in hwmon.read("temperatures", skip_devices=emhttp.spun_down_devices()):
+            temps.setdefault(sensor.chip, []).append(value)
         temperature_data = {}
         
         # Sensor name mappings for better readability
@@ -652,12 +1648,11 @@ def get_temperature_info():
             'nouveau': 'GPU'
         }
         
-        # Get CPU and system temps from psutil
+        # Get CPU and system temps from hwmon
         for sensor, readings in temps.items():
             if readings:
                 friendly_name = sensor_names.get(sensor, sensor.title())
-                max_temp = max([reading.current for reading in readings if reading.current is not None])
-                temperature_data[friendly_name] = max_temp
+                temperature_data[friendly_name] = max(readings)
         
         # Get drive temperatures from Unraid's data
         drive_temps = get_drive_temperatures()
@@ -669,136 +1664,413 @@ def get_temperature_info():
         print(f"Error getting temperature info: {e}")
         return {"error": "Temperature sensors unavailable"}
 
+def get_sensor_info():
+    """Every hwmon temperature (°C), fan (RPM) and voltage (V) input"""
+    try:
+        sensors = {kind: [] for kind, _ in HWMON_KINDS.values()}
+        for sensor, value in hwmon.read(skip_devices=emhttp.spun_down_devices()):
+            sensors[sensor.kind].append(
+                {"chip": sensor.chip, "label": sensor.label, "value": round(value, 3)}
+            )
+        return sensors
+    except Exception as e:
+        print(f"Error getting sensor info: {e}")
+        return {"error": "Hardware sensors unavailable"}
+
+
 def get_drive_temperatures():
     """Get drive temperatures from Unraid's disks.ini file"""
-    drive_temps = {}
-    
-    disks_ini_path = '/host/var/local/emhttp/disks.ini'
-    
-    if not os.path.exists(disks_ini_path):
-        return {}
-    
     try:
-        with open(disks_ini_path, 'r') as f:
-            content = f.read()
-        
-        # Parse the INI-like format
-        lines = content.split('\n')
-        current_drive = None
-        drive_data = {}
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Look for drive sections [drive_name]
-            if line.startswith('[') and line.endswith(']'):
-                # Save previous drive data if it has a temperature
-                if current_drive and 'temp' in drive_data:
-                    temp_value = drive_data['temp']
-                    if temp_value != '*' and temp_value != '':
-                        try:
-                            temp = int(temp_value)
-                            if 10 <= temp <= 100:  # Reasonable range
-                                drive_temps[f"Drive {current_drive}"] = temp
-                        except ValueError:
-                            pass
-                
-                # Start new drive section
-                current_drive = line[1:-1]  # Remove brackets
-                drive_data = {}
-            
-            # Parse key=value pairs
-            elif '=' in line and current_drive:
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.strip().strip('"')
-                drive_data[key] = value
-        
-        # Don't forget the last drive
-        if current_drive and 'temp' in drive_data:
-            temp_value = drive_data['temp']
-            if temp_value != '*' and temp_value != '':
-                try:
-                    temp = int(temp_value)
-                    if 10 <= temp <= 100:
-                        drive_temps[f"Drive {current_drive}"] = temp
-                except ValueError:
-                    pass
-    
+        return {
+            f"Drive {disk['name']}": disk["temp"]
+            for disk in emhttp.disks()
+            if disk["temp"] is not None
+        }
     except Exception as e:
         print(f"Error reading disks.ini: {e}")
-    
-    return drive_temps
+        return {}
 
-def get_top_processes():
-    """Get top processes from host using psutil with PROCFS_PATH"""
-    
-    def is_container_process(process_name):
-        """Check if a process is related to containers or this app"""
-        container_processes = [
-            'gunicorn', 'python', 'flask', 'main.py',
-            'docker', 'containerd', 'runc', 'containerd-shim',
-            'system-monitor', 'monitor'
-        ]
-        
-        process_lower = process_name.lower()
-        return any(container_proc in process_lower for container_proc in container_processes)
-    
-    class HostProcessContext:
-        def __enter__(self):
-            self.original_procfs = getattr(psutil, 'PROCFS_PATH', '/proc')
-            psutil.PROCFS_PATH = "/host/proc"
-            return self
-        
-        def __exit__(self, exc_type, exc_val, exc_tb):
-            psutil.PROCFS_PATH = self.original_procfs
-    
-    try:
-        with HostProcessContext():
-            processes = []
-            # Get all processes and calculate CPU usage more efficiently
-            all_procs = []
-            
-            # First pass: collect all processes
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    all_procs.append(proc)
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+
+HOST_PROC_PATH = "/host/proc"
+HOST_PASSWD_PATH = "/host/etc/passwd"
+USER_NAMES_MAX_AGE = 300
+
+CONTAINER_PROCESSES = [
+    'gunicorn', 'python', 'flask', 'main.py',
+    'docker', 'containerd', 'runc', 'containerd-shim',
+    'system-monitor', 'monitor'
+]
+
+
+# One precompiled pattern instead of a substring scan per name, and since the same
+# few hundred names repeat on every scan the answer is cached per name
+container_process_pattern = re.compile(
+    "|".join(re.escape(name) for name in CONTAINER_PROCESSES), re.IGNORECASE
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def is_container_process(process_name):
+    """Check if a process is related to containers or this app"""
+    return container_process_pattern.search(process_name) is not None
+
+
+PROCESS_GROUP_MODES = ("name", "tree", "cgroup")
+PROCESS_GROUP_LIMIT = 100
+
+# Docker cgroup paths carry the full 64-character container id; the short id is enough
+container_id_pattern = re.compile(r"\b([0-9a-f]{12})[0-9a-f]{52}\b")
+
+
+class ProcessEntry:
+    """Per-process state carried from one scan to the next"""
+
+    __slots__ = ("start", "uid", "cgroup", "cpu_ticks", "io", "ppid", "name", "tree", "usage")
+
+    def __init__(self, start, uid, cgroup):
+        self.start = start
+        self.uid = uid
+        self.cgroup = cgroup
+        self.tree = None
+        self.usage = (0.0, 0, 0.0)
+
+
+class ProcessTable:
+    """Host processes read straight from the host procfs and kept between scans.
+
+    Each scan reads only /proc/<pid>/stat (and io when permitted) with raw
+    os.read calls and parses the bytes in place; RSS comes from stat as well,
+    so statm is not needed.
+
+    Entries are keyed by pid and start time, so a reused pid starts a new entry.
+    Keeping the previous CPU and I/O counters lets every scan report real rates
+    over the time since the last scan without sleeping, and without switching
+    psutil's global PROCFS_PATH under other threads.
+
+    Totals per process name, process tree and cgroup are updated from each
+    process's change since the previous scan rather than summed from scratch.
+    """
+
+    def __init__(self, proc_path=HOST_PROC_PATH):
+        self.proc_path = proc_path
+        self.entries = {}
+        self.processes = []
+        self.last_scan = None
+        self.mem_total = None
+        self.names = {}
+        self.user_names = {}
+        self.users_loaded_at = None
+        self.groups = {mode: {} for mode in PROCESS_GROUP_MODES}
+        self.lock = threading.Lock()
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def read_mem_total(self):
+        with open(os.path.join(self.proc_path, "meminfo"), "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+        return psutil.virtual_memory().total
+
+    def load_user_names(self):
+        """uid -> user name, from the host's passwd when it is mounted
+
+        The container's own /etc/passwd would map host uids to the wrong names,
+        so without the host file processes are reported by numeric uid.
+        """
+        names = {}
+        try:
+            with open(HOST_PASSWD_PATH, "r") as f:
+                for line in f:
+                    parts = line.split(":")
+                    if len(parts) > 2 and parts[2].isdigit():
+                        names[int(parts[2])] = parts[0]
+        except OSError:
+            pass
+        self.user_names = names
+        self.users_loaded_at = time.monotonic()
+
+    def read_uptime(self):
+        with open(os.path.join(self.proc_path, "uptime"), "r") as f:
+            return float(f.read().split()[0])
+
+    def read_file(self, path, size=1024):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return os.read(fd, size)
+        finally:
+            os.close(fd)
+
+    def read_stat(self, pid):
+        """(name, ppid, cpu ticks, threads, start time, rss pages) from /proc/<pid>/stat"""
+        data = self.read_file(f"{self.proc_path}/{pid}/stat")
+        # The command name may itself contain spaces and parentheses
+        name_end = data.rindex(b")")
+        raw_name = data[data.index(b"(") + 1 : name_end]
+        name = self.names.get(raw_name)
+        if name is None:
+            name = self.names[raw_name] = raw_name.decode(errors="replace")
+        fields = data[name_end + 2 :].split(None, 22)
+        return (
+            name,
+            int(fields[1]),
+            int(fields[11]) + int(fields[12]),
+            int(fields[17]),
+            int(fields[19]),
+            int(fields[21]),
+        )
+
+    def read_io(self, pid):
+        """Bytes read/written; needs ptrace access, so it is often unavailable"""
+        try:
+            data = self.read_file(f"{self.proc_path}/{pid}/io", 512)
+            read_at = data.index(b"read_bytes:") + 11
+            write_at = data.index(b"\nwrite_bytes:") + 13
+            return (
+                int(data[read_at : data.index(b"\n", read_at)]),
+                int(data[write_at : data.index(b"\n", write_at)]),
+            )
+        except PermissionError:
+            return False
+        except (OSError, ValueError):
+            return None
+
+    def read_cgroup(self, pid):
+        """The process's cgroup path, read once when the process is first seen"""
+        try:
+            data = self.read_file(f"{self.proc_path}/{pid}/cgroup", 4096).decode(errors="replace")
+        except OSError:
+            return "unknown"
+
+        paths = {}
+        for line in data.splitlines():
+            parts = line.split(":", 2)
+            if len(parts) == 3:
+                paths[parts[1]] = parts[2]
+        # cgroup v2 has a single "0::" line; on v1 prefer the cpu hierarchy
+        path = paths.get("")
+        if path is None:
+            path = next(
+                (p for controllers, p in paths.items() if "cpu" in controllers.split(",")),
+                next(iter(paths.values()), "unknown"),
+            )
+        return container_id_pattern.sub(r"\1", path) or "/"
+
+    def tree_key(self, pid, entries):
+        """Group of the ancestor just below init, e.g. every process a container started"""
+        chain = []
+        entry = entries[pid]
+        while entry.tree is None and len(chain) < 128:
+            chain.append(entry)
+            parent = entries.get(entry.ppid)
+            if entry.ppid in (0, 1) or parent is None:
+                key = f"{entry.name} ({pid})"
+                break
+            pid, entry = entry.ppid, parent
+        else:
+            key = entry.tree
+        for member in chain:
+            member.tree = key
+        return key
+
+    def update_groups(self, keys, usage, count):
+        """Add usage to the totals of every group in keys, or take it out when count is -1
+
+        count is +1 when a process joins the groups, -1 when it leaves and 0
+        when only its usage changed (usage is then a delta).
+        """
+        sign = -1 if count < 0 else 1
+        for groups, key in zip(self.groups.values(), keys):
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = [0.0, 0, 0.0, 0]
+            totals[0] += sign * usage[0]
+            totals[1] += sign * usage[1]
+            totals[2] += sign * usage[2]
+            totals[3] += count
+            if totals[3] <= 0:
+                del groups[key]
+
+    def scan(self):
+        """Refresh the table and return the list of processes"""
+        with self.lock:
+            if self.mem_total is None:
+                self.mem_total = self.read_mem_total()
+            if len(self.names) > 65536:
+                self.names = {}
+            if self.users_loaded_at is None or time.monotonic() - self.users_loaded_at > USER_NAMES_MAX_AGE:
+                self.load_user_names()
+
+            now = time.monotonic()
+            elapsed = now - self.last_scan if self.last_scan else None
+            uptime = self.read_uptime()
+            ticks = self.clock_ticks
+            page_size = self.page_size
+            previous_entries = self.entries
+            entries = {}
+            continuing = {}
+            rows = []
+
+            for name in os.listdir(self.proc_path):
+                if not name.isdigit():
                     continue
-            
-            # Small sleep for CPU percentage calculation
-            time.sleep(0.1)
-            
-            # Second pass: get CPU and memory info, filter out container processes
-            for proc in all_procs:
+                pid = int(name)
                 try:
-                    with proc.oneshot():
-                        process_name = proc.name()
-                        
-                        # Skip container-related processes
-                        if is_container_process(process_name):
-                            continue
-                            
-                        cpu_percent = proc.cpu_percent(interval=0.0)
-                        memory_info = proc.memory_info()
-                        
-                        processes.append({
-                            'pid': proc.pid,
-                            'name': process_name,
-                            'cpu_percent': cpu_percent,
-                            'memory_percent': proc.memory_percent(),
-                            'memory_mb': memory_info.rss / 1024 / 1024
-                        })
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    process_name, ppid, cpu_ticks, threads, start, rss = self.read_stat(pid)
+                except (OSError, ValueError, IndexError):
+                    # Exited while we were reading it
                     continue
-            
-            # Sort by CPU usage and return top processes
-            processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-            return processes[:10]
-            
+
+                previous = previous_entries.get(pid)
+                if previous is not None and previous.start != start:
+                    previous = None
+
+                # Once io has been refused for a process, don't ask again
+                io = False if previous is not None and previous.io is False else self.read_io(pid)
+
+                if previous is not None and elapsed:
+                    cpu_percent = (cpu_ticks - previous.cpu_ticks) / ticks / elapsed * 100
+                elif elapsed:
+                    # Started since the last scan: average over its lifetime
+                    lifetime = uptime - start / ticks
+                    cpu_percent = cpu_ticks / ticks / max(lifetime, elapsed) * 100
+                else:
+                    cpu_percent = 0.0
+
+                read_rate = write_rate = 0.0
+                if io and previous is not None and previous.io and elapsed:
+                    read_rate = max(io[0] - previous.io[0], 0) / elapsed
+                    write_rate = max(io[1] - previous.io[1], 0) / elapsed
+
+                if previous is not None:
+                    # Reuse the entry; remember what it contributed to its groups
+                    entry = previous
+                    continuing[pid] = (
+                        (entry.name, entry.tree, entry.cgroup),
+                        entry.usage,
+                    )
+                    if entry.ppid != ppid:
+                        entry.tree = None
+                else:
+                    # The owner and cgroup are looked up once, when the process is first seen
+                    try:
+                        uid = os.stat(f"{self.proc_path}/{pid}").st_uid
+                    except OSError:
+                        continue
+                    entry = ProcessEntry(start, uid, self.read_cgroup(pid))
+
+                entry.cpu_ticks = cpu_ticks
+                entry.io = io
+                entry.ppid = ppid
+                entry.name = process_name
+                entry.usage = (cpu_percent, rss * page_size, read_rate + write_rate)
+                entries[pid] = entry
+                rows.append((pid, entry, threads, read_rate, write_rate))
+
+            # Processes that were not seen again have exited: take them out of their groups
+            for pid, entry in previous_entries.items():
+                if entries.get(pid) is not entry:
+                    self.update_groups((entry.name, entry.tree, entry.cgroup), entry.usage, -1)
+
+            mem_percent_scale = 100 / self.mem_total
+            processes = []
+            for pid, entry, threads, read_rate, write_rate in rows:
+                keys = (entry.name, self.tree_key(pid, entries), entry.cgroup)
+                old = continuing.get(pid)
+                if old is None:
+                    self.update_groups(keys, entry.usage, 1)
+                elif old[0] == keys:
+                    # Idle processes are the common case and change nothing
+                    if entry.usage != old[1]:
+                        delta = tuple(new - prev for new, prev in zip(entry.usage, old[1]))
+                        self.update_groups(keys, delta, 0)
+                else:
+                    self.update_groups(old[0], old[1], -1)
+                    self.update_groups(keys, entry.usage, 1)
+
+                cpu_percent, rss_bytes, _ = entry.usage
+                processes.append(
+                    {
+                        "pid": pid,
+                        "ppid": entry.ppid,
+                        "name": entry.name,
+                        "user": self.user_names.get(entry.uid, str(entry.uid)),
+                        "cpu_percent": round(cpu_percent, 1),
+                        "memory_percent": rss_bytes * mem_percent_scale,
+                        "memory_mb": rss_bytes / 1024 / 1024,
+                        "threads": threads,
+                        "io_read_rate": read_rate,
+                        "io_write_rate": write_rate,
+                    }
+                )
+
+            self.entries = entries
+            self.processes = processes
+            self.last_scan = now
+            return processes
+
+    def group_totals(self, limit=PROCESS_GROUP_LIMIT):
+        """Busiest groups for every grouping, from the incrementally kept totals"""
+        with self.lock:
+            result = {}
+            for mode, groups in self.groups.items():
+                busiest = heapq.nlargest(limit, groups.items(), key=lambda item: item[1][0])
+                result[mode] = [
+                    {
+                        "group": key,
+                        "count": totals[3],
+                        "cpu_percent": round(max(totals[0], 0.0), 1),
+                        "memory_mb": max(totals[1], 0) / 1024 / 1024,
+                        "io_rate": max(totals[2], 0.0),
+                    }
+                    for key, totals in busiest
+                ]
+            return result
+
+
+process_table = ProcessTable()
+
+
+PROCESS_SORT_KEYS = {
+    "cpu": lambda proc: proc["cpu_percent"],
+    "mem": lambda proc: proc["memory_mb"],
+    "io": lambda proc: proc["io_read_rate"] + proc["io_write_rate"],
+    "threads": lambda proc: proc["threads"],
+}
+PROCESS_MAX_LIMIT = 500
+
+
+def get_process_table():
+    """Scan every host process; queries select from the published result"""
+    try:
+        processes = process_table.scan()
+        return {"processes": processes, "groups": process_table.group_totals()}
     except Exception as e:
         print(f"Error getting host processes: {e}")
-        return []
+        return {"processes": [], "groups": {mode: [] for mode in PROCESS_GROUP_MODES}}
+
+
+def get_top_processes(processes, sort="cpu", limit=10, include=None, exclude=None, containers=False):
+    """Select the top processes from a scanned process table.
+
+    include/exclude are lists of lowercase substrings matched against the
+    process name and user. Uses heap selection, so a query is O(n log limit).
+    """
+    if not isinstance(processes, list):
+        return processes
+
+    def wanted(proc):
+        if not containers and is_container_process(proc["name"]):
+            return False
+        if include or exclude:
+            text = f"{proc['name']} {proc['user']}".lower()
+            if include and not any(pattern in text for pattern in include):
+                return False
+            if exclude and any(pattern in text for pattern in exclude):
+                return False
+        return True
+
+    return heapq.nlargest(limit, filter(wanted, processes), key=PROCESS_SORT_KEYS[sort])
 
 
 @app.route("/")
@@ -872,23 +2144,89 @@ def test_js():
 import time
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from cachetools import TTLCache
-import functools
+from cachetools import LRUCache, TTLCache
+
+# Every ttl_cache-wrapped function, for the hit ratios on /api/debug/collectors
+ttl_cache_registry = []
+
 
 # Custom TTL cache decorator
-def ttl_cache(maxsize=128, ttl=300):
+def ttl_cache(maxsize=128, ttl=300, stale_while_revalidate=False):
+    """Cache results for ttl seconds with single-flight refreshes.
+
+    When an entry expires only one caller runs the function; concurrent callers
+    wait for its result. With stale_while_revalidate they get the previous value
+    immediately instead and the refresh runs in a background thread.
+    """
+
     def decorator(func):
         cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        stale = LRUCache(maxsize=maxsize)
+        in_flight = {}
+        lock = threading.Lock()
+        stats = {"hits": 0, "misses": 0, "stale_hits": 0, "refreshes": 0, "errors": 0}
+
+        def refresh(key, args, kwargs):
+            try:
+                result = func(*args, **kwargs)
+                with lock:
+                    cache[key] = result
+                    stale[key] = result
+                return result
+            except Exception:
+                with lock:
+                    stats["errors"] += 1
+                raise
+            finally:
+                with lock:
+                    in_flight.pop(key).set()
+
+        def refresh_in_background(key, args, kwargs):
+            try:
+                refresh(key, args, kwargs)
+            except Exception as e:
+                print(f"Error refreshing {func.__name__}: {e}")
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             key = str(args) + str(kwargs)
-            if key in cache:
-                return cache[key]
-            result = func(*args, **kwargs)
-            cache[key] = result
-            return result
-
+            with lock:
+                if key in cache:
+                    stats["hits"] += 1
+                    return cache[key]
+
+                event = in_flight.get(key)
+                owner = event is None
+                if owner:
+                    event = in_flight[key] = threading.Event()
+                    stats["refreshes"] += 1
+
+                serve_stale = stale_while_revalidate and key in stale
+                if serve_stale:
+                    stats["stale_hits"] += 1
+                    value = stale[key]
+                else:
+                    stats["misses"] += 1
+
+            if serve_stale:
+                if owner:
+                    threading.Thread(
+                        target=refresh_in_background, args=(key, args, kwargs), daemon=True
+                    ).start()
+                return value
+
+            if owner:
+                return refresh(key, args, kwargs)
+
+            event.wait()
+            with lock:
+                if key in cache:
+                    return cache[key]
+            # The refresh we waited on failed, try it ourselves
+            return func(*args, **kwargs)
+
+        wrapper.cache_stats = lambda: dict(stats)
+        ttl_cache_registry.append(wrapper)
         return wrapper
 
     return decorator
@@ -898,105 +2236,1786 @@ def ttl_cache(maxsize=128, ttl=300):
 limiter = Limiter(key_func=get_remote_address)
 limiter.init_app(app)
 
-# Add caching to expensive operations
-@ttl_cache(maxsize=32, ttl=2)
+# Shared snapshot store: with several gunicorn workers only one of them (the one
+# holding the sampler lock) runs the collectors. It writes every new sample into
+# mmap'd files under the data directory, one per collector, and the other workers
+# read them from there.
+DATA_DIR = os.environ.get("DATA_DIR", "/app/data")
+SHARED_SNAPSHOT_SIZE = 64 * 1024
+SHARED_SNAPSHOT_MAX_AGE = 60
+SAMPLER_LEADER_RETRY = 5
+
+
+def is_writable_dir(path):
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(path, os.W_OK)
+
+
+def get_data_dir():
+    """Writable directory shared by all workers: DATA_DIR, else the temp directory"""
+    for path in (DATA_DIR, tempfile.gettempdir()):
+        if is_writable_dir(path):
+            return path
+    return None
+
+
+class SharedSegment:
+    """One JSON sample in a memory-mapped file, guarded by a seqlock.
+
+    Header is an 8-byte write counter and an 8-byte payload length. The writer
+    makes the counter odd while it writes, so readers retry on odd or changed
+    counters. Readers only parse the payload when the counter has moved.
+    """
+
+    HEADER = struct.Struct("<QQ")
+
+    def __init__(self, path, size=SHARED_SNAPSHOT_SIZE):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, os.fstat(self.fd).st_size)
+        self.write_lock = threading.Lock()
+        self.written_seq = 0
+        self.cached_counter = None
+        self.cached = None
+
+    def _remap_if_grown(self):
+        size = os.fstat(self.fd).st_size
+        if size != len(self.map):
+            self.map.close()
+            self.map = mmap.mmap(self.fd, size)
+
+    def write(self, sample):
+        with self.write_lock:
+            # A collector can be re-run while an older result is still being written
+            if sample["seq"] <= self.written_seq:
+                return
+            self.written_seq = sample["seq"]
+
+            payload = json.dumps(sample, separators=(",", ":")).encode()
+            needed = self.HEADER.size + len(payload)
+            self._remap_if_grown()
+            if needed > len(self.map):
+                os.ftruncate(self.fd, needed * 2)
+                self._remap_if_grown()
+
+            counter, _ = self.HEADER.unpack_from(self.map, 0)
+            counter += 2 - counter % 2
+            self.HEADER.pack_into(self.map, 0, counter - 1, 0)
+            self.map[self.HEADER.size : needed] = payload
+            self.HEADER.pack_into(self.map, 0, counter, len(payload))
+
+    def read(self):
+        """Return the latest sample, or None if nothing has been written yet"""
+        self._remap_if_grown()
+        for _ in range(10):
+            counter, length = self.HEADER.unpack_from(self.map, 0)
+            if counter == 0:
+                return None
+            if counter == self.cached_counter:
+                return self.cached
+            if counter % 2 or self.HEADER.size + length > len(self.map):
+                # Writer is mid-update (or just grew the file)
+                time.sleep(0.001)
+                self._remap_if_grown()
+                continue
+
+            payload = self.map[self.HEADER.size : self.HEADER.size + length]
+            if self.HEADER.unpack_from(self.map, 0)[0] != counter:
+                continue
+            self.cached = json.loads(payload)
+            self.cached_counter = counter
+            return self.cached
+        return self.cached
+
+
+class SharedSnapshotStore:
+    """Per-collector shared segments plus the lock that elects the collecting worker.
+
+    Keeping one segment per collector means a new sample only rewrites, and
+    readers only re-parse, the collector that changed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock_path = os.path.join(directory, "sampler.lock")
+        self.lock_fd = None
+        self.segments = {}
+        self.segments_lock = threading.Lock()
+
+    def try_lock(self):
+        """Become the collecting process; the lock is released when the process exits"""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.lock_fd = fd
+        return True
+
+    def segment(self, name):
+        with self.segments_lock:
+            segment = self.segments.get(name)
+            if segment is None:
+                path = os.path.join(self.directory, f"snapshot-{name}.shm")
+                segment = self.segments[name] = SharedSegment(path)
+            return segment
+
+    def write(self, name, sample):
+        self.segment(name).write(sample)
+
+    def read(self, name):
+        return self.segment(name).read()
+
+
+def open_shared_snapshot_store():
+    directory = get_data_dir()
+    if directory is None:
+        return None
+    try:
+        return SharedSnapshotStore(directory)
+    except OSError as e:
+        print(f"Shared snapshot store unavailable, collecting per worker: {e}")
+        return None
+
+
+# Background sampler: collectors run on their own threads and schedules so API
+# requests never wait on a slow collector, they only read the latest sample.
+SAMPLER_FIRST_SAMPLE_TIMEOUT = 10
+SAMPLER_REFRESH_INTERVAL = 0.05
+# Collectors run under a deadline on an isolated thread; after a few failures in
+# a row their circuit opens and they are left alone for a growing cooldown while
+# the last good value is served marked stale
+COLLECTOR_DEADLINE = 5
+COLLECTOR_BREAKER_THRESHOLD = 3
+COLLECTOR_BREAKER_COOLDOWN = 30
+COLLECTOR_BREAKER_MAX_COOLDOWN = 300
+COLLECTOR_STALE_MAX_AGE = 300
+
+
+COLLECTOR_TIMINGS_KEPT = 256
+# Collections slower than this (seconds) are logged, at most once a minute each
+COLLECTOR_BUDGET = float(os.environ.get("COLLECTOR_BUDGET", 1.0))
+COLLECTOR_BUDGET_LOG_INTERVAL = 60
+
+
+class CollectorStats:
+    """Call and error counts plus a window of recent durations for one collector"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.durations = collections.deque(maxlen=COLLECTOR_TIMINGS_KEPT)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.over_budget = 0
+        self.logged_at = None
+        self.lock = threading.Lock()
+
+    def record(self, name, duration, error=None, timed_out=False):
+        with self.lock:
+            self.calls += 1
+            self.durations.append(duration)
+            if error is not None:
+                self.errors += 1
+            if timed_out:
+                self.timeouts += 1
+            if duration <= self.budget:
+                return
+            self.over_budget += 1
+            now = time.monotonic()
+            if self.logged_at is not None and now - self.logged_at < COLLECTOR_BUDGET_LOG_INTERVAL:
+                return
+            self.logged_at = now
+        print(f"Collector {name} took {duration:.3f}s (budget {self.budget:.3f}s)")
+
+    def summary(self):
+        with self.lock:
+            durations = sorted(self.durations)
+            summary = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "over_budget": self.over_budget,
+                "budget": self.budget,
+                "last": self.durations[-1] if self.durations else None,
+            }
+        if durations:
+            summary["p50"] = durations[len(durations) // 2]
+            summary["p95"] = durations[min(int(len(durations) * 0.95), len(durations) - 1)]
+            summary["max"] = durations[-1]
+        return summary
+
+
+class CircuitBreaker:
+    """Counts consecutive failures and opens for a cooldown that doubles each time"""
+
+    def __init__(self, threshold, cooldown, max_cooldown):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0
+
+    def allow(self):
+        # Once the cooldown is over a single trial call goes through; if it fails
+        # the count is still over the threshold and the circuit opens again
+        return time.monotonic() >= self.open_until
+
+    def success(self):
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+
+
+class Sampler:
+    """Runs registered collectors in background threads and keeps their latest sample.
+
+    With a shared store only the worker that wins the store lock collects; the
+    others serve whatever it last published and keep trying to take over.
+    """
+
+    def __init__(self, store=None):
+        self.collectors = {}
+        self.samples = {}
+        self.store = store
+        self.leader = False
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.started = False
+        self.seq = 0
+        self.refreshed_at = 0
+        # Called once this process becomes the collecting one
+        self.leader_hooks = []
+
+    def register(self, name, func, interval, deadline=COLLECTOR_DEADLINE, budget=COLLECTOR_BUDGET):
+        self.collectors[name] = {
+            "func": func,
+            "interval": interval,
+            "deadline": deadline,
+            "stats": CollectorStats(budget),
+            "breaker": CircuitBreaker(
+                COLLECTOR_BREAKER_THRESHOLD, COLLECTOR_BREAKER_COOLDOWN, COLLECTOR_BREAKER_MAX_COOLDOWN
+            ),
+            "last_good": None,
+        }
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+
+        if self.store is None or self.store.try_lock():
+            self._become_leader()
+        else:
+            threading.Thread(target=self._follow, name="sampler-follower", daemon=True).start()
+
+    def _become_leader(self):
+        if self.store is not None:
+            # Carry on from the previous collector: same sequence, recent samples
+            stored = [self.store.read(name) for name in self.collectors]
+            shared = self.read_shared()
+            with self.lock:
+                self.samples = shared
+                self.seq = max([self.seq] + [sample["seq"] for sample in stored if sample])
+        self.leader = True
+
+        for name in self.collectors:
+            thread = threading.Thread(
+                target=self._run, args=(name,), name=f"sampler-{name}", daemon=True
+            )
+            thread.start()
+
+        for hook in self.leader_hooks:
+            hook()
+
+    def _follow(self):
+        while not self.stop_event.wait(SAMPLER_LEADER_RETRY):
+            if self.store.try_lock():
+                print("Collector worker exited, taking over metric collection")
+                self._become_leader()
+                return
+
+    def _run(self, name):
+        collector = self.collectors[name]
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            self.collect(name, collector)
+            duration = time.monotonic() - started
+
+            # Keep a fixed rate: a slow collection eats into its own interval
+            self.stop_event.wait(max(collector["interval"] - duration, 0))
+
+    def collect(self, name, collector):
+        """Run one collection under the collector's deadline and circuit breaker"""
+        breaker = collector["breaker"]
+        if not breaker.allow():
+            current = self.samples.get(name)
+            if current is None or not current.get("stale"):
+                self.publish_stale(name, collector, "Collector disabled after repeated failures")
+            return
+
+        started = time.monotonic()
+        timed_out = False
+        try:
+            data = isolated_calls.call(("collector", name), collector["deadline"], collector["func"])
+            error = data.get("error") if isinstance(data, dict) else None
+        except concurrent.futures.TimeoutError:
+            data = None
+            error = f"Collector timed out after {collector['deadline']}s"
+            timed_out = True
+        except Exception as e:
+            data = None
+            error = str(e)
+        duration = time.monotonic() - started
+        collector["stats"].record(name, duration, error, timed_out)
+
+        if error is None:
+            breaker.success()
+            collector["last_good"] = (data, time.monotonic())
+            self.publish(name, data, duration)
+            return
+
+        print(f"Error in {name} collector: {error}")
+        breaker.failure()
+        if not self.publish_stale(name, collector, error, duration):
+            self.publish(name, data if data is not None else {"error": error}, duration)
+
+    def publish_stale(self, name, collector, error, duration=0.0):
+        """Publish the last good value marked stale, if there is a recent enough one"""
+        last_good = collector["last_good"]
+        if last_good is None or time.monotonic() - last_good[1] > COLLECTOR_STALE_MAX_AGE:
+            return False
+        self.publish(name, last_good[0], duration, stale=True, error=error)
+        return True
+
+    def publish(self, name, data, duration=0.0, stale=False, error=None):
+        with self.lock:
+            self.seq += 1
+            sample = {
+                "data": data,
+                "timestamp": time.time(),
+                "duration": duration,
+                "seq": self.seq,
+            }
+            if stale:
+                sample["stale"] = True
+                sample["error"] = error
+            self.samples = dict(self.samples)
+            self.samples[name] = sample
+
+        if self.store is not None:
+            try:
+                self.store.write(name, sample)
+            except Exception as e:
+                print(f"Error writing shared snapshot: {e}")
+
+    def read_shared(self):
+        samples = {}
+        for name in self.collectors:
+            sample = self.store.read(name)
+            if sample is not None:
+                samples[name] = sample
+        if not samples:
+            return {}
+
+        # Ignore samples left behind by a previous run of the container
+        newest = max(sample["timestamp"] for sample in samples.values())
+        if time.time() - newest > SHARED_SNAPSHOT_MAX_AGE:
+            return {}
+        return samples
+
+    def refresh(self):
+        """Followers pick up the collector's latest samples from the shared store"""
+        if self.leader or self.store is None:
+            return
+        if time.monotonic() - self.refreshed_at < SAMPLER_REFRESH_INTERVAL:
+            return
+        self.refreshed_at = time.monotonic()
+
+        samples = self.read_shared()
+        if samples:
+            self.samples = samples
+            self.seq = max(sample["seq"] for sample in samples.values())
+
+    def current_seq(self):
+        self.refresh()
+        return self.seq
+
+    def latest(self, name):
+        """A collector's latest sample without waiting for it, None before the first one"""
+        self.refresh()
+        return self.samples.get(name)
+
+    def sample_seq(self, name):
+        """Sequence number of a collector's latest sample, None before the first one"""
+        sample = self.latest(name)
+        return sample["seq"] if sample is not None else None
+
+    def stale(self, name):
+        """Whether a collector's latest sample is a last good value standing in for a failure"""
+        sample = self.samples.get(name)
+        return sample is not None and sample.get("stale", False)
+
+    def collector_stats(self):
+        return {name: collector["stats"].summary() for name, collector in self.collectors.items()}
+
+    def get(self, name):
+        """Return the latest sample for a collector, waiting only for the very first one"""
+        self.start()
+        deadline = time.monotonic() + SAMPLER_FIRST_SAMPLE_TIMEOUT
+        while True:
+            self.refresh()
+            sample = self.samples.get(name)
+            if sample is not None:
+                return sample["data"]
+            if time.monotonic() > deadline:
+                return {"error": "Sample not available yet"}
+            time.sleep(0.05)
+
+
+sampler = Sampler(open_shared_snapshot_store())
+sampler.register("cpu", get_cpu_info, 2)
+sampler.register("memory", get_memory_info, 2)
+# Pools give each mount its own statvfs deadline, so allow for a few slow ones
+sampler.register("pools", get_pools_info, 5, deadline=15)
+sampler.register("gpu", get_gpu_info, 2)
+sampler.register("network", get_network_info, 2)
+sampler.register("disk_io", get_disk_io_info, 1)
+sampler.register("temperatures", get_temperature_info, 2)
+sampler.register("process_table", get_process_table, 5)
+sampler.register("containers", get_container_stats, 2)
+sampler.register("sensors", get_sensor_info, 2)
+sampler.register("array", get_array_info, 5)
+
+
+@app.before_request
+def start_sampler():
+    sampler.start()
+
+
+# Persistent history: round-robin archives under DATA_DIR/history, one fixed-size
+# file per metric holding raw samples plus min/max/avg rollups. Only the collecting
+# worker records, so each file has a single writer.
+HISTORY_STEP = 2
+HISTORY_TIERS = (
+    ("raw", HISTORY_STEP, 6 * 3600 // HISTORY_STEP),  # 6 hours
+    ("1m", 60, 7 * 24 * 60),  # 7 days
+    ("5m", 300, 30 * 24 * 12),  # 30 days
+    ("1h", 3600, 365 * 24),  # 1 year
+)
+# Files kept per category (cpu, memory, network, disk_io, temperatures, pools), so
+# many drives can't crowd out the others; a 30-drive array needs under 100 in each
+HISTORY_MAX_METRICS_PER_CATEGORY = 192
+
+
+def history_metric_name(*parts):
+    return ".".join(re.sub(r"[^a-z0-9]+", "_", str(part).lower()).strip("_") for part in parts)
+
+
+class HistoryFile:
+    """One metric's archive: a memory-mapped file with a ring of records per tier.
+
+    Records are (timestamp, min, max, avg, count) and live in slot timestamp // step
+    modulo the tier size, so writes are O(1) and the file never grows. count is
+    the number of raw samples behind a rollup, so a restarted recorder can merge
+    into the bucket it left off with the right weight.
+    """
+
+    HEADER_SIZE = 128
+    RECORD = struct.Struct("<IfffI")
+
+    def __init__(self, path, tiers=HISTORY_TIERS, writable=False):
+        self.tiers = tiers
+        self.offsets = []
+        size = self.HEADER_SIZE
+        for _, _, slots in tiers:
+            self.offsets.append(size)
+            size += slots * self.RECORD.size
+
+        header = b"SMH2" + struct.pack(f"<{len(tiers) * 2}I", *[v for t in tiers for v in t[1:]])
+        fd = os.open(path, os.O_RDWR | os.O_CREAT if writable else os.O_RDONLY, 0o644)
+        try:
+            matches = os.fstat(fd).st_size == size and os.pread(fd, len(header), 0) == header
+            if not matches:
+                if not writable:
+                    raise ValueError(f"{path} has a different layout")
+                # New file, or one written with other tiers: start it over
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self.map = mmap.mmap(fd, size, access=access)
+        finally:
+            os.close(fd)
+
+    def write(self, tier, timestamp, minimum, maximum, average, count=1):
+        _, step, slots = self.tiers[tier]
+        bucket = int(timestamp) // step
+        offset = self.offsets[tier] + (bucket % slots) * self.RECORD.size
+        self.RECORD.pack_into(self.map, offset, bucket * step, minimum, maximum, average, count)
+
+    def read_bucket(self, tier, timestamp):
+        """The record of the bucket holding timestamp, or None if it was never written"""
+        _, step, slots = self.tiers[tier]
+        bucket = int(timestamp) // step
+        offset = self.offsets[tier] + (bucket % slots) * self.RECORD.size
+        record = self.RECORD.unpack_from(self.map, offset)
+        return record if record[0] == bucket * step and record[4] else None
+
+    def read(self, tier, start, end):
+        """Records of one tier whose buckets overlap start..end, oldest first"""
+        _, step, slots = self.tiers[tier]
+        first = max(int(start) // step, int(end) // step - slots + 1)
+        last = int(end) // step
+        if last < first:
+            return []
+
+        # The bucket range maps onto at most two contiguous runs of slots
+        records = []
+        bucket = first
+        while bucket <= last:
+            slot = bucket % slots
+            count = min(last - bucket + 1, slots - slot)
+            offset = self.offsets[tier] + slot * self.RECORD.size
+            view = self.map[offset : offset + count * self.RECORD.size]
+            records.extend(self.RECORD.iter_unpack(view))
+            bucket += count
+
+        # Slots that were never written or hold an older lap of the ring are skipped
+        return [
+            record for index, record in enumerate(records) if record[0] == (first + index) * step
+        ]
+
+
+class HistoryRecorder:
+    """Feeds the latest samples into the history files every HISTORY_STEP seconds"""
+
+    def __init__(self, directory, tiers=HISTORY_TIERS):
+        self.directory = directory
+        self.tiers = tiers
+        self.files = {}
+        self.category_counts = collections.Counter()
+        self.refused = set()
+        self.rollups = {}
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._run, name="history-recorder", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.record(time.time(), sampler.samples)
+            except Exception as e:
+                print(f"Error recording history: {e}")
+            time.sleep(HISTORY_STEP)
+
+    def collect_metrics(self, samples):
+        """Metric name -> value, the aggregates of every category before any per-device metric"""
+        def data(name):
+            sample = samples.get(name)
+            return sample["data"] if sample else None
+
+        metrics = {}
+        devices = {}
+
+        cpu = data("cpu")
+        if isinstance(cpu, dict) and "usage" in cpu:
+            metrics["cpu.usage"] = cpu["usage"]
+            if cpu.get("breakdown"):
+                metrics["cpu.iowait"] = cpu["breakdown"]["iowait"]
+            if cpu.get("temperature") is not None:
+                metrics["cpu.temperature"] = cpu["temperature"]
+
+        memory = data("memory")
+        if isinstance(memory, dict) and "percent" in memory:
+            metrics["memory.percent"] = memory["percent"]
+            metrics["memory.used"] = memory["used"]
+            metrics["memory.swap_percent"] = memory["swap_percent"]
+
+        network = data("network")
+        if isinstance(network, dict) and "current_sent" in network:
+            metrics["network.sent"] = network["current_sent"]
+            metrics["network.recv"] = network["current_recv"]
+            for interface in network.get("interfaces", []):
+                devices[history_metric_name("network", interface["name"], "sent")] = interface["sent_rate"]
+                devices[history_metric_name("network", interface["name"], "recv")] = interface["recv_rate"]
+
+        disk_io = data("disk_io")
+        if isinstance(disk_io, dict) and "read_speed" in disk_io:
+            metrics["disk_io.read"] = disk_io["read_speed"]
+            metrics["disk_io.write"] = disk_io["write_speed"]
+            for device in disk_io.get("devices", []):
+                # Unraid's mdX array devices pass their I/O on to the sdX disks
+                # that are already recorded
+                if device["name"].startswith("md"):
+                    continue
+                devices[history_metric_name("disk_io", device["name"], "read")] = device["read_rate"]
+                devices[history_metric_name("disk_io", device["name"], "write")] = device["write_rate"]
+                devices[history_metric_name("disk_io", device["name"], "util")] = device["util_percent"]
+
+        temperatures = data("temperatures")
+        if isinstance(temperatures, dict):
+            for sensor, value in temperatures.items():
+                if isinstance(value, (int, float)):
+                    devices[history_metric_name("temperatures", sensor)] = value
+
+        pools = data("pools")
+        if isinstance(pools, list):
+            for pool in pools:
+                devices[history_metric_name("pools", pool["name"], "percent")] = pool["percent"]
+                devices[history_metric_name("pools", pool["name"], "used")] = pool["used"]
+
+        metrics.update(devices)
+        return metrics
+
+    def get_file(self, metric):
+        history_file = self.files.get(metric)
+        if history_file is None:
+            if metric in self.refused:
+                return None
+            category = metric.split(".", 1)[0]
+            if self.category_counts[category] >= HISTORY_MAX_METRICS_PER_CATEGORY:
+                self.refused.add(metric)
+                print(
+                    f"History for {metric} not recorded: {category} already has "
+                    f"{HISTORY_MAX_METRICS_PER_CATEGORY} metrics"
+                )
+                return None
+            path = os.path.join(self.directory, f"{metric}.rrd")
+            history_file = self.files[metric] = HistoryFile(path, self.tiers, writable=True)
+            self.category_counts[category] += 1
+        return history_file
+
+    def record(self, now, samples):
+        for metric, value in self.collect_metrics(samples).items():
+            history_file = self.get_file(metric)
+            if history_file is None:
+                continue
+
+            value = float(value)
+            history_file.write(0, now, value, value, value)
+
+            # Rollup tiers hold the running aggregate of their current bucket. A
+            # bucket seen for the first time may already be on disk from before a
+            # restart or a change of leader: carry on from that record
+            for tier in range(1, len(self.tiers)):
+                bucket = int(now) // self.tiers[tier][1]
+                rollup = self.rollups.get((metric, tier))
+                if rollup is None or rollup[0] != bucket:
+                    stored = history_file.read_bucket(tier, now)
+                    if stored is None:
+                        rollup = [bucket, value, value, 0.0, 0]
+                    else:
+                        _, minimum, maximum, average, count = stored
+                        rollup = [bucket, minimum, maximum, average * count, count]
+                    self.rollups[(metric, tier)] = rollup
+                rollup[1] = min(rollup[1], value)
+                rollup[2] = max(rollup[2], value)
+                rollup[3] += value
+                rollup[4] += 1
+                history_file.write(tier, now, rollup[1], rollup[2], rollup[3] / rollup[4], rollup[4])
+
+
+def get_history_dir():
+    """History has to outlive restarts, so unlike the shared samples it never falls back to /tmp"""
+    return os.path.join(DATA_DIR, "history") if is_writable_dir(DATA_DIR) else None
+
+
+if get_history_dir():
+    history_recorder = HistoryRecorder(get_history_dir())
+    sampler.leader_hooks.append(history_recorder.start)
+else:
+    print(f"History disabled: {DATA_DIR} is not writable, mount a volume there to keep history")
+
+
+# System info is cheap and rarely changes, so it stays a plain cached call
+@ttl_cache(maxsize=32, ttl=2, stale_while_revalidate=True)
 def get_cached_system_info():
     return get_system_info()
 
 
-@ttl_cache(maxsize=32, ttl=2)
 def get_cached_memory_info():
-    return get_memory_info()
+    return sampler.get("memory")
 
 
-@ttl_cache(maxsize=32, ttl=2)
 def get_cached_cpu_info():
-    return get_cpu_info()
+    return sampler.get("cpu")
 
 
-@ttl_cache(maxsize=32, ttl=2)
 def get_cached_gpu_info():
-    return get_gpu_info()
+    return sampler.get("gpu")
 
 
-@ttl_cache(maxsize=32, ttl=5)
 def get_cached_pools_info():
-    return get_pools_info()
+    return sampler.get("pools")
 
 
-@ttl_cache(maxsize=32, ttl=2)
 def get_cached_network_info():
-    return get_network_info()
+    return sampler.get("network")
 
 
-@ttl_cache(maxsize=32, ttl=1)
 def get_cached_disk_io():
-    return get_disk_io_info()
+    return sampler.get("disk_io")
 
 
-@ttl_cache(maxsize=32, ttl=2)
 def get_cached_temperatures():
-    return get_temperature_info()
+    return sampler.get("temperatures")
+
 
+def get_cached_sensor_info():
+    return sampler.get("sensors")
 
-@ttl_cache(maxsize=32, ttl=5)
-def get_cached_top_processes():
-    return get_top_processes()
+
+def get_cached_array_info():
+    return sampler.get("array")
+
+
+def get_cached_top_processes(**query):
+    table = sampler.get("process_table")
+    return get_top_processes(table.get("processes", table), **query)
+
+
+def get_cached_container_stats():
+    return sampler.get("containers")
+
+
+def get_cached_process_groups(by="name", limit=10):
+    table = sampler.get("process_table")
+    if "groups" not in table:
+        return table
+    return table["groups"][by][:limit]
 
 
 # Update API endpoints with caching and rate limiting
+# Response encoding: bodies are serialised and compressed once per sample and
+# reused until the collectors behind them publish again. ETags are a digest of the
+# body, so a resample with unchanged values still answers 304.
+RESPONSE_CACHE_SIZE = 256
+COMPRESS_MIN_SIZE = 1024
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def msgpack_encode(obj):
+    """Encode JSON-like data as MessagePack (nil, bool, int, float, str, bin, array, map)"""
+    out = bytearray()
+
+    def pack(value):
+        if value is None:
+            out.append(0xC0)
+        elif value is True:
+            out.append(0xC3)
+        elif value is False:
+            out.append(0xC2)
+        elif isinstance(value, int):
+            if 0 <= value < 0x80:
+                out.append(value)
+            elif -0x20 <= value < 0:
+                out.append(value & 0xFF)
+            elif value >= 0:
+                for limit, code, fmt in ((0x100, 0xCC, ">B"), (0x10000, 0xCD, ">H"), (0x100000000, 0xCE, ">I")):
+                    if value < limit:
+                        out.append(code)
+                        out.extend(struct.pack(fmt, value))
+                        break
+                else:
+                    out.append(0xCF)
+                    out.extend(struct.pack(">Q", value))
+            else:
+                for limit, code, fmt in ((0x80, 0xD0, ">b"), (0x8000, 0xD1, ">h"), (0x80000000, 0xD2, ">i")):
+                    if value >= -limit:
+                        out.append(code)
+                        out.extend(struct.pack(fmt, value))
+                        break
+                else:
+                    out.append(0xD3)
+                    out.extend(struct.pack(">q", value))
+        elif isinstance(value, float):
+            out.append(0xCB)
+            out.extend(struct.pack(">d", value))
+        elif isinstance(value, str):
+            data = value.encode("utf-8")
+            header(len(data), 0xA0, 32, 0xD9, 0xDA, 0xDB)
+            out.extend(data)
+        elif isinstance(value, (bytes, bytearray)):
+            header(len(value), None, 0, 0xC4, 0xC5, 0xC6)
+            out.extend(value)
+        elif isinstance(value, (list, tuple)):
+            header(len(value), 0x90, 16, None, 0xDC, 0xDD)
+            for item in value:
+                pack(item)
+        elif isinstance(value, dict):
+            header(len(value), 0x80, 16, None, 0xDE, 0xDF)
+            for key, item in value.items():
+                pack(key)
+                pack(item)
+        else:
+            pack(str(value))
+
+    def header(length, fix, fix_limit, code8, code16, code32):
+        if fix is not None and length < fix_limit:
+            out.append(fix | length)
+        elif code8 is not None and length < 0x100:
+            out.append(code8)
+            out.append(length)
+        elif length < 0x10000:
+            out.append(code16)
+            out.extend(struct.pack(">H", length))
+        else:
+            out.append(code32)
+            out.extend(struct.pack(">I", length))
+
+    pack(obj)
+    return bytes(out)
+
+
+class EncodedBody:
+    """One serialised response body with its ETag and lazily compressed variants"""
+
+    def __init__(self, version, body, mimetype):
+        self.version = version
+        self.body = body
+        self.mimetype = mimetype
+        self.digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.etag = f'W/"{self.digest}"'
+        self.compressed = {}
+
+    def encoded(self, encoding):
+        body = self.compressed.get(encoding)
+        if body is None:
+            if encoding == "gzip":
+                body = gzip.compress(self.body, compresslevel=6, mtime=0)
+            else:
+                body = zlib.compress(self.body, 6)
+            self.compressed[encoding] = body
+        return body
+
+
+response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE)
+response_cache_lock = threading.Lock()
+
+
+def response_format():
+    """msgpack when asked for with ?format=msgpack or an Accept header, else JSON"""
+    if request.args.get("format") == "msgpack":
+        return "msgpack"
+    best = request.accept_mimetypes.best_match(("application/json",) + MSGPACK_MIMETYPES)
+    return "msgpack" if best in MSGPACK_MIMETYPES else "json"
+
+
+def encode_body(data, version, fmt):
+    if fmt == "msgpack":
+        return EncodedBody(version, msgpack_encode(data), MSGPACK_MIMETYPES[0])
+    body = app.json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return EncodedBody(version, body, "application/json")
+
+
+def encoded_response(*sources):
+    """Serve a view's data with an ETag, optional compression and optional msgpack.
+
+    sources name the collectors the data comes from ("*" for any of them); the
+    encoded body is reused while their sample seqs stay the same. Views without
+    sources are encoded on every request but still get ETags and compression.
+    Views may return a Response or (response, status) for errors; those pass
+    through untouched.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            fmt = response_format()
+            version = None
+            if sources:
+                version = tuple(
+                    sampler.current_seq() if name == "*" else sampler.sample_seq(name)
+                    for name in sources
+                )
+            key = (request.full_path, fmt)
+
+            with response_cache_lock:
+                entry = response_cache.get(key)
+            if entry is None or version is None or entry.version != version:
+                data = func(*args, **kwargs)
+                if isinstance(data, (Response, tuple)):
+                    return data
+                entry = encode_body(data, version, fmt)
+                if version is not None:
+                    with response_cache_lock:
+                        response_cache[key] = entry
+
+            headers = {
+                "ETag": entry.etag,
+                "Cache-Control": "no-cache",
+                "Vary": "Accept, Accept-Encoding",
+            }
+            if request.if_none_match.contains_weak(entry.digest):
+                return Response(status=304, headers=headers)
+
+            body = entry.body
+            if len(body) >= COMPRESS_MIN_SIZE:
+                encodings = request.accept_encodings
+                encoding = max(("gzip", "deflate"), key=lambda name: encodings[name])
+                if encodings[encoding] > 0:
+                    with response_cache_lock:
+                        body = entry.encoded(encoding)
+                    headers["Content-Encoding"] = encoding
+            return Response(body, mimetype=entry.mimetype, headers=headers)
+
+        return wrapper
+
+    return decorator
+
+
 @app.route("/api/system-info")
 @limiter.limit("10 per second")
+@encoded_response()
 def api_system_info():
-    return jsonify(get_cached_system_info())
+    return get_cached_system_info()
 
 
 @app.route("/api/memory-info")
 @limiter.limit("10 per second")
+@encoded_response("memory")
 def api_memory_info():
-    return jsonify(get_cached_memory_info())
+    return get_cached_memory_info()
 
 
 @app.route("/api/cpu-info")
 @limiter.limit("10 per second")
+@encoded_response("cpu")
 def api_cpu_info():
-    return jsonify(get_cached_cpu_info())
+    return get_cached_cpu_info()
 
 
 @app.route("/api/gpu-info")
 @limiter.limit("10 per second")
+@encoded_response("gpu")
 def api_gpu_info():
-    return jsonify(get_cached_gpu_info())
+    return get_cached_gpu_info()
 
 
 @app.route("/api/pools")
 @limiter.limit("5 per second")
+@encoded_response("pools")
 def api_pools():
-    return jsonify(get_cached_pools_info())
+    return get_cached_pools_info()
 
 
 @app.route("/api/network")
 @limiter.limit("5 per second")
+@encoded_response("network")
 def api_network():
-    return jsonify(get_cached_network_info())
+    return get_cached_network_info()
 
 
 @app.route("/api/disk-io")
 @limiter.limit("5 per second")
+@encoded_response("disk_io")
 def api_disk_io():
-    return jsonify(get_cached_disk_io())
+    return get_cached_disk_io()
 
 
 @app.route("/api/temperatures")
 @limiter.limit("5 per second")
+@encoded_response("temperatures")
 def api_temperatures():
-    return jsonify(get_cached_temperatures())
+    return get_cached_temperatures()
+
+
+@app.route("/api/sensors")
+@limiter.limit("5 per second")
+@encoded_response("sensors")
+def api_sensors():
+    return get_cached_sensor_info()
+
+
+@app.route("/api/array")
+@limiter.limit("5 per second")
+@encoded_response("array")
+def api_array():
+    return get_cached_array_info()
 
 
 @app.route("/api/top-processes")
 @limiter.limit("10 per second")
+@encoded_response("process_table")
 def api_top_processes():
-    return jsonify(get_cached_top_processes())
+    sort = request.args.get("sort", "cpu")
+    if sort not in PROCESS_SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(PROCESS_SORT_KEYS)}"}), 400
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+
+    def patterns(name):
+        value = request.args.get(name, "")
+        return [pattern.strip().lower() for pattern in value.split(",") if pattern.strip()]
+
+    return get_cached_top_processes(
+        sort=sort,
+        limit=max(1, min(limit, PROCESS_MAX_LIMIT)),
+        include=patterns("include"),
+        exclude=patterns("exclude"),
+        containers=request.args.get("containers", "0").lower() in ("1", "true", "yes"),
+    )
+
+
+@app.route("/api/containers")
+@limiter.limit("10 per second")
+@encoded_response("containers")
+def api_containers():
+    return get_cached_container_stats()
+
+
+@app.route("/api/process-groups")
+@limiter.limit("10 per second")
+@encoded_response("process_table")
+def api_process_groups():
+    """Combined usage per process name, process tree or cgroup"""
+    by = request.args.get("by", "name")
+    if by not in PROCESS_GROUP_MODES:
+        return jsonify({"error": f"by must be one of {', '.join(PROCESS_GROUP_MODES)}"}), 400
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+
+    return get_cached_process_groups(by=by, limit=max(1, min(limit, PROCESS_GROUP_LIMIT)))
+
+
+# Every section the dashboard renders, in the order it renders them
+SNAPSHOT_SECTIONS = {
+    "system": get_cached_system_info,
+    "cpu": get_cached_cpu_info,
+    "memory": get_cached_memory_info,
+    "pools": get_cached_pools_info,
+    "gpu": get_cached_gpu_info,
+    "network": get_cached_network_info,
+    "disk_io": get_cached_disk_io,
+    "temperatures": get_cached_temperatures,
+    "processes": get_cached_top_processes,
+    "process_groups": get_cached_process_groups,
+    "containers": get_cached_container_stats,
+    "sensors": get_cached_sensor_info,
+    "array": get_cached_array_info,
+}
+
+# Collector behind each section, for flagging sections served from a stale sample
+SNAPSHOT_SOURCES = {
+    "cpu": "cpu",
+    "memory": "memory",
+    "pools": "pools",
+    "gpu": "gpu",
+    "network": "network",
+    "disk_io": "disk_io",
+    "temperatures": "temperatures",
+    "processes": "process_table",
+    "process_groups": "process_table",
+    "containers": "containers",
+    "sensors": "sensors",
+    "array": "array",
+}
+
+
+def build_snapshot(sections):
+    """The requested sections plus the list of those served from a stale sample"""
+    snapshot = {name: SNAPSHOT_SECTIONS[name]() for name in sections}
+    snapshot["stale"] = [
+        name for name in sections if name in SNAPSHOT_SOURCES and sampler.stale(SNAPSHOT_SOURCES[name])
+    ]
+    return snapshot
+
+
+# Delta snapshots: each full snapshot is kept under a token naming the worker that
+# built it and the sample seq it was built at, so a client that sends ?since=<token>
+# gets only what changed since then. Workers build their snapshots independently and
+# may see their samples at different moments, so equal seqs don't mean equal contents:
+# a token from another worker, or one too old, falls back to a full snapshot.
+SNAPSHOT_HISTORY = 32
+
+
+def snapshot_diff(base, current, path=()):
+    """Fields of current that differ from base, plus the key paths base has and current lacks.
+
+    Dicts are compared key by key; anything else, lists included, is replaced whole.
+    """
+    patch, removed = {}, []
+    for key, value in current.items():
+        if key not in base:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(base[key], dict):
+            sub_patch, sub_removed = snapshot_diff(base[key], value, path + (key,))
+            if sub_patch:
+                patch[key] = sub_patch
+            removed.extend(sub_removed)
+        elif value != base[key]:
+            patch[key] = value
+    removed.extend(list(path + (key,)) for key in base if key not in current)
+    return patch, removed
+
+
+class SnapshotRing:
+    """The last few full snapshots this worker served, keyed by their token"""
+
+    def __init__(self, size):
+        self.size = size
+        self.snapshots = {}
+        self.epoch = None
+        self.pid = None
+        self.latest = None
+        self.lock = threading.Lock()
+
+    def current(self):
+        """(token, snapshot) for the current seq, built once per seq"""
+        seq = sampler.current_seq()
+        with self.lock:
+            if self.latest != seq:
+                if self.pid != os.getpid() or (self.latest is not None and seq < self.latest):
+                    # A new worker (forked with a copy of this ring), or the seqs
+                    # started over under a new collector: old tokens name other contents
+                    self.pid = os.getpid()
+                    self.epoch = os.urandom(4).hex()
+                    self.snapshots = {}
+                self.latest = seq
+                self.snapshots[f"{self.epoch}-{seq}"] = build_snapshot(SNAPSHOT_SECTIONS)
+                while len(self.snapshots) > self.size:
+                    del self.snapshots[next(iter(self.snapshots))]
+            token = f"{self.epoch}-{seq}"
+            return token, self.snapshots[token]
+
+    def get(self, token):
+        with self.lock:
+            return self.snapshots.get(token)
+
+
+snapshot_ring = SnapshotRing(SNAPSHOT_HISTORY)
+
+
+def select_sections(snapshot, sections):
+    view = {name: snapshot[name] for name in sections}
+    view["stale"] = [name for name in snapshot["stale"] if name in sections]
+    return view
+
+
+@app.route("/api/snapshot")
+@limiter.limit("10 per second")
+@encoded_response("*")
+def api_snapshot():
+    """All dashboard sections in one response, optionally filtered with ?sections=a,b.
+
+    With ?since=<seq> the response is {"seq", "since", "patch", "removed"} holding
+    only the changes since that snapshot, or a full snapshot if this worker no
+    longer has it. seq is an opaque token to be sent back as it is.
+    """
+    sections = list(SNAPSHOT_SECTIONS)
+    requested = request.args.get("sections")
+    if requested:
+        sections = [name.strip() for name in requested.split(",") if name.strip()]
+        unknown = [name for name in sections if name not in SNAPSHOT_SECTIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown sections: {', '.join(unknown)}"}), 400
+    since = request.args.get("since")
+
+    seq, snapshot = snapshot_ring.current()
+    view = select_sections(snapshot, sections)
+    base = snapshot_ring.get(since) if since else None
+    if base is None:
+        view["seq"] = seq
+        return view
+
+    patch, removed = snapshot_diff(select_sections(base, sections), view)
+    return {"seq": seq, "since": since, "patch": patch, "removed": removed}
+
+
+# Server-Sent Events: one background thread serialises the snapshot once per
+# tick and every subscriber is handed the same encoded message: the changes since
+# the previous tick as a "patch" event, or the full snapshot for subscribers that
+# just joined or missed a tick. Each open stream holds a gunicorn thread, so only
+# part of the thread pool may be used by streams.
+STREAM_INTERVAL = 2
+STREAM_KEEPALIVE = 15
+# Each stream holds a gthread worker thread for as long as it is open; half of
+# them stay free for API requests and clients over the cap poll instead
+STREAM_MAX_CLIENTS = int(
+    os.environ.get(
+        "STREAM_MAX_CLIENTS", max(int(os.environ.get("GUNICORN_THREADS", 4)) // 2, 1)
+    )
+)
+
+
+class SnapshotBroadcaster:
+    """Fans out one serialised snapshot per tick to all stream subscribers"""
+
+    def __init__(self, interval, max_clients):
+        self.interval = interval
+        self.max_clients = max_clients
+        self.condition = threading.Condition()
+        self.message = None
+        self.patch_message = None
+        self.previous = None
+        self.tick = 0
+        self.subscribers = 0
+        self.last_seq = None
+        self.started = False
+
+    def start(self):
+        with self.condition:
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self._run, name="stream-broadcaster", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                # Only serialise when someone is listening and a new sample exists
+                seq = sampler.current_seq() if self.subscribers else self.last_seq
+                if seq != self.last_seq:
+                    self.last_seq = seq
+                    seq, snapshot = snapshot_ring.current()
+                    payload = json.dumps(dict(snapshot, seq=seq), separators=(",", ":"))
+                    message = f"data: {payload}\n\n".encode()
+                    patch_message = None
+                    previous = self.previous
+                    if previous is not None:
+                        patch, removed = snapshot_diff(previous[1], snapshot)
+                        delta = {"seq": seq, "since": previous[0], "patch": patch, "removed": removed}
+                        payload = json.dumps(delta, separators=(",", ":"))
+                        patch_message = f"event: patch\ndata: {payload}\n\n".encode()
+                    with self.condition:
+                        if not self.subscribers:
+                            # Everyone left while this was built; don't keep it for later
+                            self.last_seq = None
+                        else:
+                            self.previous = (seq, snapshot)
+                            self.message = message
+                            self.patch_message = patch_message
+                            self.tick += 1
+                            self.condition.notify_all()
+            except Exception as e:
+                print(f"Error broadcasting snapshot: {e}")
+            time.sleep(self.interval)
+
+    def subscribe(self):
+        """Return a generator of SSE messages, or None when the stream is full"""
+        with self.condition:
+            if self.subscribers >= self.max_clients:
+                return None
+            self.subscribers += 1
+        self.start()
+
+        def stream():
+            last_tick = 0
+            try:
+                yield f"retry: {self.interval * 1000}\n\n".encode()
+                while True:
+                    with self.condition:
+                        self.condition.wait_for(
+                            lambda: self.message is not None and self.tick != last_tick,
+                            timeout=STREAM_KEEPALIVE,
+                        )
+                        if self.message is None or self.tick == last_tick:
+                            message = b": keepalive\n\n"
+                        elif self.tick == last_tick + 1 and last_tick and self.patch_message:
+                            last_tick = self.tick
+                            message = self.patch_message
+                        else:
+                            last_tick = self.tick
+                            message = self.message
+                    yield message
+            finally:
+                with self.condition:
+                    self.subscribers -= 1
+                    if not self.subscribers:
+                        # The next subscriber must get a snapshot built after it
+                        # joined, not the last one from before everyone left
+                        self.message = self.patch_message = self.previous = self.last_seq = None
+
+        return stream()
+
+
+broadcaster = SnapshotBroadcaster(STREAM_INTERVAL, STREAM_MAX_CLIENTS)
+
+
+@app.route("/api/stream")
+@limiter.limit("1 per second")
+def api_stream():
+    stream = broadcaster.subscribe()
+    if stream is None:
+        # Clients fall back to polling /api/snapshot
+        return jsonify({"error": "Too many stream clients"}), 503
+
+    return Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# History queries: pick the finest rollup tier that covers the range without
+# returning far more buckets than requested, then downsample to the point budget.
+HISTORY_DEFAULT_POINTS = 800
+HISTORY_MAX_POINTS = 5000
+HISTORY_OVERSAMPLE = 4
+HISTORY_METRIC_PATTERN = re.compile(r"^[a-z0-9_]+(\.[a-z0-9_]+)*$")
+
+history_readers = {}
+history_readers_lock = threading.Lock()
+
+
+def get_history_reader(metric):
+    with history_readers_lock:
+        reader = history_readers.get(metric)
+        if reader is None:
+            path = os.path.join(get_history_dir(), f"{metric}.rrd")
+            reader = history_readers[metric] = HistoryFile(path)
+        return reader
+
+
+def choose_history_tier(start, end, points, now):
+    """Finest tier that still holds start and needs at most a few buckets per point"""
+    for tier, (_, step, slots) in enumerate(HISTORY_TIERS):
+        covers_start = now - step * slots <= start
+        if covers_start and (end - start) / step <= points * HISTORY_OVERSAMPLE:
+            return tier
+    return len(HISTORY_TIERS) - 1
+
+
+def downsample_minmax(records, points):
+    """Merge consecutive records into points buckets keeping min, max and the sample-weighted mean"""
+    if len(records) <= points:
+        return records
+    size = len(records) / points
+    merged = []
+    for index in range(points):
+        bucket = records[int(index * size) : int((index + 1) * size)]
+        if bucket:
+            count = sum(r[4] for r in bucket)
+            merged.append(
+                (
+                    bucket[0][0],
+                    min(r[1] for r in bucket),
+                    max(r[2] for r in bucket),
+                    sum(r[3] * r[4] for r in bucket) / count if count else bucket[0][3],
+                    count,
+                )
+            )
+    return merged
+
+
+def downsample_lttb(records, points):
+    """Largest-Triangle-Three-Buckets on the average, keeping original records"""
+    if len(records) <= points or points < 3:
+        return records
+    size = (len(records) - 2) / (points - 2)
+    sampled = [records[0]]
+    previous = records[0]
+    for index in range(points - 2):
+        start = int(index * size) + 1
+        end = int((index + 1) * size) + 1
+        next_end = min(int((index + 2) * size) + 1, len(records))
+        next_bucket = records[end:next_end] or [records[-1]]
+        avg_x = sum(r[0] for r in next_bucket) / len(next_bucket)
+        avg_y = sum(r[3] for r in next_bucket) / len(next_bucket)
+
+        best = max(
+            records[start:end],
+            key=lambda r: abs(
+                (previous[0] - avg_x) * (r[3] - previous[3])
+                - (previous[0] - r[0]) * (avg_y - previous[3])
+            ),
+        )
+        sampled.append(best)
+        previous = best
+    sampled.append(records[-1])
+    return sampled
+
+
+@app.route("/api/history")
+@limiter.limit("5 per second")
+@encoded_response()
+def api_history():
+    """Stored history for one metric, or the list of metrics when none is given"""
+    history_dir = get_history_dir()
+    if history_dir is None:
+        return jsonify({"error": "History storage unavailable"}), 503
+
+    metric = request.args.get("metric")
+    if not metric:
+        try:
+            files = os.listdir(history_dir)
+        except FileNotFoundError:
+            files = []
+        return sorted(f[: -len(".rrd")] for f in files if f.endswith(".rrd"))
+
+    if not HISTORY_METRIC_PATTERN.match(metric):
+        return jsonify({"error": "Invalid metric name"}), 400
+
+    now = time.time()
+    try:
+        end = float(request.args.get("to", now))
+        start = float(request.args.get("from", end - 3600))
+        points = int(request.args.get("points", HISTORY_DEFAULT_POINTS))
+    except ValueError:
+        return jsonify({"error": "from, to and points must be numbers"}), 400
+    if not (math.isfinite(start) and math.isfinite(end)):
+        return jsonify({"error": "from and to must be finite"}), 400
+    points = max(2, min(points, HISTORY_MAX_POINTS))
+    method = request.args.get("method", "minmax")
+    if method not in ("minmax", "lttb"):
+        return jsonify({"error": "method must be minmax or lttb"}), 400
+    if end < start:
+        return jsonify({"error": "from must be before to"}), 400
+
+    try:
+        reader = get_history_reader(metric)
+    except (FileNotFoundError, ValueError):
+        return jsonify({"error": f"No history for {metric}"}), 404
+
+    tier = choose_history_tier(start, end, points, now)
+    records = reader.read(tier, start, end)
+    if method == "lttb":
+        records = downsample_lttb(records, points)
+    else:
+        records = downsample_minmax(records, points)
+
+    name, step, _ = HISTORY_TIERS[tier]
+    return {
+        "metric": metric,
+        "tier": name,
+        "step": step,
+        "from": start,
+        "to": end,
+        "points": [
+            [r[0], round(r[1], 3), round(r[2], 3), round(r[3], 3)] for r in records
+        ],
+    }
+
+
+# Prometheus text exposition. Every family's HELP/TYPE header is prebuilt; each
+# collector's block is rendered once per sample seq from the sample already in
+# memory, and a scrape only joins the cached blocks, so it never collects anything.
+METRICS_PREFIX = "system_monitor_"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_FAMILIES = {
+    "cpu_usage_percent": ("gauge", "CPU busy time over the last sample"),
+    "cpu_core_usage_percent": ("gauge", "Per-core busy time over the last sample"),
+    "cpu_mode_percent": ("gauge", "CPU time per mode over the last sample"),
+    "cpu_frequency_mhz": ("gauge", "Current CPU frequency"),
+    "cpu_temperature_celsius": ("gauge", "Hottest CPU sensor"),
+    "load_average": ("gauge", "System load average"),
+    "memory_bytes": ("gauge", "Memory by use"),
+    "memory_used_percent": ("gauge", "Used share of memory"),
+    "swap_bytes": ("gauge", "Swap by use"),
+    "pool_size_bytes": ("gauge", "Storage pool size"),
+    "pool_used_bytes": ("gauge", "Storage pool space used"),
+    "pool_free_bytes": ("gauge", "Storage pool space available"),
+    "gpu_utilization_percent": ("gauge", "GPU utilisation"),
+    "gpu_memory_utilization_percent": ("gauge", "GPU memory controller utilisation"),
+    "gpu_memory_used_bytes": ("gauge", "GPU memory used"),
+    "gpu_memory_total_bytes": ("gauge", "GPU memory size"),
+    "gpu_temperature_celsius": ("gauge", "GPU temperature"),
+    "gpu_power_watts": ("gauge", "GPU power draw"),
+    "gpu_power_limit_watts": ("gauge", "GPU power limit"),
+    "gpu_clock_mhz": ("gauge", "GPU clock speed"),
+    "gpu_processes": ("gauge", "Compute processes on the GPU"),
+    "network_receive_bytes_total": ("counter", "Bytes received on all interfaces"),
+    "network_transmit_bytes_total": ("counter", "Bytes sent on all interfaces"),
+    "network_receive_bytes_per_second": ("gauge", "Receive rate per interface"),
+    "network_transmit_bytes_per_second": ("gauge", "Transmit rate per interface"),
+    "network_receive_packets_per_second": ("gauge", "Packets received per second per interface"),
+    "network_transmit_packets_per_second": ("gauge", "Packets sent per second per interface"),
+    "network_errors_per_second": ("gauge", "Interface errors per second"),
+    "network_drops_per_second": ("gauge", "Interface drops per second"),
+    "network_up": ("gauge", "Whether the interface is up"),
+    "disk_read_bytes_total": ("counter", "Bytes read from all disks"),
+    "disk_written_bytes_total": ("counter", "Bytes written to all disks"),
+    "disk_reads_completed_total": ("counter", "Reads completed on all disks"),
+    "disk_writes_completed_total": ("counter", "Writes completed on all disks"),
+    "disk_read_bytes_per_second": ("gauge", "Read rate per disk"),
+    "disk_written_bytes_per_second": ("gauge", "Write rate per disk"),
+    "disk_iops": ("gauge", "I/O operations per second per disk"),
+    "disk_await_seconds": ("gauge", "Average time per I/O per disk"),
+    "disk_utilization_percent": ("gauge", "Time the disk was busy"),
+    "temperature_celsius": ("gauge", "Hottest reading per sensor or drive"),
+    "collector_last_sample_timestamp_seconds": ("gauge", "When the collector last published"),
+    "collector_duration_seconds": ("gauge", "How long the last collection took"),
+    "collector_stale": ("gauge", "Whether the collector is serving its last good value"),
+}
+METRIC_HEADERS = {
+    name: f"# HELP {METRICS_PREFIX}{name} {help_text}\n# TYPE {METRICS_PREFIX}{name} {kind}\n"
+    for name, (kind, help_text) in METRIC_FAMILIES.items()
+}
+
+
+def metric_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsBlock:
+    """Collects samples per family and renders them in exposition order"""
+
+    def __init__(self):
+        self.families = {}
+
+    def add(self, name, value, **labels):
+        if value is None or isinstance(value, str):
+            return
+        self.families.setdefault(name, []).append((labels, float(value)))
+
+    def render(self):
+        lines = []
+        for name, samples in self.families.items():
+            lines.append(METRIC_HEADERS[name])
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{metric_label_value(v)}"' for key, v in labels.items())
+                label_text = "{" + label_text + "}" if label_text else ""
+                lines.append(f"{METRICS_PREFIX}{name}{label_text} {value!r}\n")
+        return "".join(lines)
+
+
+def cpu_metrics(block, cpu):
+    block.add("cpu_usage_percent", cpu.get("usage"))
+    for core, usage in enumerate(cpu.get("per_cpu_usage") or []):
+        block.add("cpu_core_usage_percent", usage, core=core)
+    for mode, percent in (cpu.get("breakdown") or {}).items():
+        block.add("cpu_mode_percent", percent, mode=mode)
+    block.add("cpu_frequency_mhz", cpu.get("frequency"))
+    block.add("cpu_temperature_celsius", cpu.get("temperature"))
+    for period, load in zip(("1m", "5m", "15m"), cpu.get("load_avg") or ()):
+        block.add("load_average", load, period=period)
+
+
+def memory_metrics(block, memory):
+    for kind in ("total", "used", "free", "system", "vm", "docker"):
+        block.add("memory_bytes", memory.get(kind), type=kind)
+    block.add("memory_used_percent", memory.get("percent"))
+    for kind in ("total", "used", "free"):
+        block.add("swap_bytes", memory.get(f"swap_{kind}"), type=kind)
+
+
+def pools_metrics(block, pools):
+    for pool in pools:
+        labels = {"pool": pool["name"], "mountpoint": pool["mountpoint"], "fstype": pool["fstype"]}
+        block.add("pool_size_bytes", pool["total"], **labels)
+        block.add("pool_used_bytes", pool["used"], **labels)
+        block.add("pool_free_bytes", pool["free"], **labels)
+
+
+def gpu_metrics(block, gpus):
+    for index, gpu in enumerate(gpus):
+        labels = {"gpu": index, "name": gpu.get("name"), "bus": gpu.get("pci_bus")}
+        block.add("gpu_utilization_percent", gpu.get("utilization"), **labels)
+        block.add("gpu_memory_utilization_percent", gpu.get("memory_utilization"), **labels)
+        # nvidia-smi reports memory in MiB
+        for field, name in (("memory_used", "gpu_memory_used_bytes"), ("memory_total", "gpu_memory_total_bytes")):
+            if gpu.get(field) is not None:
+                block.add(name, gpu[field] * 1024 * 1024, **labels)
+        block.add("gpu_temperature_celsius", gpu.get("temperature"), **labels)
+        block.add("gpu_power_watts", gpu.get("power_draw"), **labels)
+        block.add("gpu_power_limit_watts", gpu.get("power_limit"), **labels)
+        block.add("gpu_clock_mhz", gpu.get("clock_graphics"), clock="graphics", **labels)
+        block.add("gpu_clock_mhz", gpu.get("clock_memory"), clock="memory", **labels)
+        block.add("gpu_processes", gpu.get("process_count"), **labels)
+
+
+def network_metrics(block, network):
+    block.add("network_receive_bytes_total", network.get("bytes_recv"))
+    block.add("network_transmit_bytes_total", network.get("bytes_sent"))
+    for interface in network.get("interfaces", []):
+        name = interface["name"]
+        block.add("network_receive_bytes_per_second", interface["recv_rate"], interface=name)
+        block.add("network_transmit_bytes_per_second", interface["sent_rate"], interface=name)
+        block.add("network_receive_packets_per_second", interface["packets_recv_rate"], interface=name)
+        block.add("network_transmit_packets_per_second", interface["packets_sent_rate"], interface=name)
+        block.add("network_errors_per_second", interface["errors_in_rate"], interface=name, direction="receive")
+        block.add("network_errors_per_second", interface["errors_out_rate"], interface=name, direction="transmit")
+        block.add("network_drops_per_second", interface["drops_in_rate"], interface=name, direction="receive")
+        block.add("network_drops_per_second", interface["drops_out_rate"], interface=name, direction="transmit")
+        block.add("network_up", interface["is_up"], interface=name)
+
+
+def disk_io_metrics(block, disk_io):
+    block.add("disk_read_bytes_total", disk_io.get("read_bytes"))
+    block.add("disk_written_bytes_total", disk_io.get("write_bytes"))
+    block.add("disk_reads_completed_total", disk_io.get("read_count"))
+    block.add("disk_writes_completed_total", disk_io.get("write_count"))
+    for device in disk_io.get("devices", []):
+        name = device["name"]
+        block.add("disk_read_bytes_per_second", device["read_rate"], device=name)
+        block.add("disk_written_bytes_per_second", device["write_rate"], device=name)
+        block.add("disk_iops", device["read_iops"], device=name, direction="read")
+        block.add("disk_iops", device["write_iops"], device=name, direction="write")
+        block.add("disk_await_seconds", device["await_ms"] / 1000, device=name)
+        block.add("disk_utilization_percent", device["util_percent"], device=name)
+
+
+def temperature_metrics(block, temperatures):
+    for sensor, value in temperatures.items():
+        if isinstance(value, (int, float)):
+            block.add("temperature_celsius", value, sensor=sensor)
+
+
+# Collector and the renderer for its data, in exposition order
+METRICS_SOURCES = (
+    ("cpu", dict, cpu_metrics),
+    ("memory", dict, memory_metrics),
+    ("pools", list, pools_metrics),
+    ("gpu", list, gpu_metrics),
+    ("network", dict, network_metrics),
+    ("disk_io", dict, disk_io_metrics),
+    ("temperatures", dict, temperature_metrics),
+)
+
+
+class MetricsExporter:
+    """The /metrics body, re-rendered only for collectors that published since the last scrape"""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.blocks = {}
+        self.version = None
+        self.body = b""
+        self.lock = threading.Lock()
+
+    def render_source(self, sample, kind, render):
+        data = sample["data"]
+        if not isinstance(data, kind) or (isinstance(data, dict) and "error" in data):
+            return ""
+        block = MetricsBlock()
+        render(block, data)
+        return block.render()
+
+    def render(self):
+        samples = [sampler.latest(name) for name, _, _ in self.sources]
+        version = tuple(sample["seq"] if sample else None for sample in samples)
+        with self.lock:
+            if version == self.version:
+                return self.body
+
+            parts = []
+            status = MetricsBlock()
+            for (name, kind, render), sample in zip(self.sources, samples):
+                if sample is None:
+                    continue
+                cached = self.blocks.get(name)
+                if cached is None or cached[0] != sample["seq"]:
+                    cached = self.blocks[name] = (sample["seq"], self.render_source(sample, kind, render))
+                parts.append(cached[1])
+                status.add("collector_last_sample_timestamp_seconds", sample["timestamp"], collector=name)
+                status.add("collector_duration_seconds", sample["duration"], collector=name)
+                status.add("collector_stale", sample.get("stale", False), collector=name)
+            parts.append(status.render())
+
+            self.body = "".join(parts).encode("utf-8")
+            self.version = version
+            return self.body
+
+
+metrics_exporter = MetricsExporter(METRICS_SOURCES)
+
+
+@app.route("/metrics")
+@limiter.limit("5 per second")
+def metrics():
+    """Prometheus text exposition of the latest samples"""
+    return Response(metrics_exporter.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+# Self-instrumentation: collectors only run in the collecting worker, so it
+# publishes its own numbers as a sample that every worker can serve.
+class ProcessStats:
+    """RSS, CPU and thread count of this worker.
+
+    CPU is averaged over at least a second, so the collector and the endpoint
+    can both ask without shortening each other's measuring window.
+    """
+
+    def __init__(self):
+        self.process = psutil.Process()
+        self.measured = None
+        self.cpu_percent = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.process.oneshot():
+            times = self.process.cpu_times()
+            now = time.monotonic()
+            with self.lock:
+                if self.measured is None:
+                    self.measured = (now, times.user + times.system)
+                elif now - self.measured[0] >= 1:
+                    elapsed = now - self.measured[0]
+                    self.cpu_percent = (times.user + times.system - self.measured[1]) / elapsed * 100
+                    self.measured = (now, times.user + times.system)
+                cpu_percent = self.cpu_percent
+            return {
+                "pid": self.process.pid,
+                "rss": self.process.memory_info().rss,
+                "cpu_percent": round(cpu_percent, 1),
+                "cpu_seconds": times.user + times.system,
+                "threads": self.process.num_threads(),
+            }
+
+
+process_stats = ProcessStats()
+
+
+def get_cache_stats():
+    caches = {}
+    for wrapper in ttl_cache_registry:
+        stats = wrapper.cache_stats()
+        lookups = stats["hits"] + stats["misses"] + stats["stale_hits"]
+        stats["hit_ratio"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else None
+        caches[wrapper.__name__] = stats
+    return caches
+
+
+def get_debug_stats():
+    with subprocess_spawns_lock:
+        spawns = dict(subprocess_spawns)
+    return {
+        "collectors": sampler.collector_stats(),
+        "subprocess_spawns": spawns,
+        "process": process_stats.get(),
+        "caches": get_cache_stats(),
+    }
+
+
+sampler.register("debug", get_debug_stats, 5)
+
+
+@app.route("/api/debug/collectors")
+@limiter.limit("2 per second")
+def api_debug_collectors():
+    """Collector timings from the collecting worker plus this worker's own numbers"""
+    return jsonify(
+        {
+            "leader": sampler.get("debug"),
+            "worker": {
+                "is_leader": sampler.leader,
+                "process": process_stats.get(),
+                "caches": get_cache_stats(),
+            },
+        }
+    )
 
 
 @app.route("/health")
@@ -82,6 +82,36 @@ export class ChartManager {
                 options: this.getChartOptions('Network Usage')
             });
         }
+
+        this.loadHistory();
+    }
+
+    async loadHistory() {
+        // Prefill the charts from server-side history so they don't start empty
+        const to = Date.now() / 1000;
+        const from = to - 20 * 2;
+        const load = async (metric) => {
+            const response = await fetch(`/api/history?metric=${metric}&from=${from}&to=${to}&points=20`);
+            return response.ok ? (await response.json()).points : [];
+        };
+
+        try {
+            const [cpu, memory] = await Promise.all([load('cpu.usage'), load('memory.percent')]);
+            this.prefillChart(this.cpuChart, cpu);
+            this.prefillChart(this.memoryChart, memory);
+        } catch (error) {
+            console.warn('History unavailable:', error);
+        }
+    }
+
+    prefillChart(chart, points) {
+        if (!chart || chart.data.labels.length > 0) return;
+
+        points.forEach(([timestamp, , , average]) => {
+            chart.data.labels.push(new Date(timestamp * 1000).toLocaleTimeString());
+            chart.data.datasets[0].data.push(average);
+        });
+        chart.update('none');
     }
 
     getChartOptions(title) {
@@ -90,4 +90,26 @@ export function validateData(data) {
     return requiredSections.every(section => 
         data[section] && !data[section].error && Object.keys(data[section]).length > 0
     );
-}
\ No newline at end of file
+}
+export function applyPatch(target, patch, removed = []) {
+    // Merge a snapshot patch in place: objects are merged key by key, anything
+    // else (arrays included) replaces the old value outright
+    Object.entries(patch).forEach(([key, value]) => {
+        const current = target[key];
+        const isObject = (v) => v !== null && typeof v === 'object' && !Array.isArray(v);
+        if (isObject(value) && isObject(current)) {
+            applyPatch(current, value);
+        } else {
+            target[key] = value;
+        }
+    });
+
+    removed.forEach(path => {
+        let parent = target;
+        for (const key of path.slice(0, -1)) {
+            parent = parent ? parent[key] : undefined;
+        }
+        if (parent) delete parent[path[path.length - 1]];
+    });
+    return target;
+}
@@ -31,12 +31,18 @@ import {
     showToast,
     updateThemeButton,
     updateHighContrastButton,
-    validateData
+    validateData,
+    applyPatch
 } from './modules/utils.js';
 
 class SystemMonitor {
     constructor() {
         this.updateInterval = 2000;
+        this.eventSource = null;
+        this.pollTimer = null;
+        // Last full snapshot and its seq, so updates can be fetched as patches
+        this.snapshot = null;
+        this.snapshotSeq = null;
         this.prevNetwork = {
             bytes_sent: 0,
             bytes_recv: 0
@@ -79,13 +85,62 @@ class SystemMonitor {
         this.setupServiceWorker();
         updateHighContrastButton();
 
-        // Initial data load with polling
+        // Initial data load, then live updates over the stream or by polling
         setTimeout(() => {
             this.updateData(false); // false = initial load, no toast
-            setInterval(() => this.updateData(false), this.updateInterval);
+            this.startUpdates();
         }, 100);
     }
 
+    startUpdates() {
+        if ('EventSource' in window) {
+            this.startStream();
+        } else {
+            this.startPolling();
+        }
+    }
+
+    startStream() {
+        const source = new EventSource('/api/stream');
+
+        source.onopen = () => this.stopPolling();
+        source.onmessage = (event) => {
+            try {
+                this.receiveSnapshot(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Invalid stream message:', error);
+            }
+        };
+        source.addEventListener('patch', (event) => {
+            try {
+                // A patch for a base we do not hold: catch up over HTTP instead
+                if (!this.receiveSnapshot(JSON.parse(event.data))) this.updateData(false);
+            } catch (error) {
+                console.error('Invalid stream message:', error);
+            }
+        });
+        source.onerror = () => {
+            // Stream refused or dropped: poll instead and try streaming again later
+            source.close();
+            this.eventSource = null;
+            this.startPolling();
+            setTimeout(() => this.startStream(), 30000);
+        };
+
+        this.eventSource = source;
+    }
+
+    startPolling() {
+        if (this.pollTimer) return;
+        this.pollTimer = setInterval(() => this.updateData(false), this.updateInterval);
+    }
+
+    stopPolling() {
+        if (!this.pollTimer) return;
+        clearInterval(this.pollTimer);
+        this.pollTimer = null;
+    }
+
     setupEventListeners() {
         // Theme toggle
         document.getElementById('theme-toggle').addEventListener('click', () => {
@@ -162,53 +217,20 @@ class SystemMonitor {
         const endPerformanceMonitor = this.performance.startMonitoring();
 
         try {
-            const responses = await Promise.allSettled([
-                fetch('/api/system-info'), fetch('/api/cpu-info'),
-                fetch('/api/memory-info'), fetch('/api/pools'),
-                fetch('/api/gpu-info'), fetch('/api/network'),
-                fetch('/api/disk-io'), fetch('/api/temperatures'),
-                fetch('/api/top-processes')
-            ]);
-
-            const data = {};
-            const endpoints = ['system', 'cpu', 'memory', 'pools', 'gpu', 'network', 'diskIO', 'temps', 'processes'];
-
-            responses.forEach((response, index) => {
-                if (response.status === 'fulfilled' && response.value.ok) {
-                    data[endpoints[index]] = response.value.json();
-                } else {
-                    data[endpoints[index]] = {
-                        error: 'Failed to fetch'
-                    };
-                    console.error(`Failed to fetch ${endpoints[index]}:`, response.reason);
-                }
-            });
-
-            // Wait for all JSON parsing to complete
-            const allData = await Promise.all(Object.values(data).map(item =>
-                Promise.resolve(item).catch(error => ({
-                    error: error.message
-                }))
-            ));
-
-            const finalData = {};
-            endpoints.forEach((endpoint, index) => {
-                finalData[endpoint] = allData[index];
-            });
-
-            if (validateData(finalData)) {
-                this.updateAllSections(finalData);
-                this.charts.updateCharts(finalData);
-                this.alerts.checkAlerts(finalData);
-
-                // Only show success toast for manual refreshes
-                if (isManualRefresh) {
-                    showToast('Data updated successfully', 'success');
-                }
-            } else {
-                showToast('Some data failed to load', 'warning');
+            // Ask only for what changed since the snapshot we already hold
+            const url = this.snapshotSeq === null || isManualRefresh
+                ? '/api/snapshot'
+                : `/api/snapshot?since=${this.snapshotSeq}`;
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`Snapshot request failed: ${response.status}`);
             }
 
+            if (!this.receiveSnapshot(await response.json(), isManualRefresh)) {
+                // The patch was against a different base: start over with a full snapshot
+                this.snapshotSeq = null;
+                await this.updateData(isManualRefresh);
+            }
         } catch (error) {
             console.error('Error fetching data:', error);
             showToast('Connection error', 'error');
@@ -217,6 +239,54 @@ class SystemMonitor {
         }
     }
 
+    receiveSnapshot(message, isManualRefresh = false) {
+        // Full snapshots replace the held state, patches are merged into it
+        if (message.patch) {
+            if (!this.snapshot || message.since !== this.snapshotSeq) return false;
+            applyPatch(this.snapshot, message.patch, message.removed);
+        } else {
+            this.snapshot = message;
+        }
+        this.snapshotSeq = message.seq;
+        this.applySnapshot(this.snapshot, isManualRefresh);
+        return true;
+    }
+
+    applySnapshot(snapshot, isManualRefresh = false) {
+        // Map API section names onto the names the dashboard uses
+        const sections = {
+            system: 'system',
+            cpu: 'cpu',
+            memory: 'memory',
+            pools: 'pools',
+            gpu: 'gpu',
+            network: 'network',
+            disk_io: 'diskIO',
+            temperatures: 'temps',
+            processes: 'processes'
+        };
+
+        const finalData = {};
+        Object.entries(sections).forEach(([section, key]) => {
+            finalData[key] = snapshot[section] || {
+                error: 'Failed to fetch'
+            };
+        });
+
+        if (validateData(finalData)) {
+            this.updateAllSections(finalData);
+            this.charts.updateCharts(finalData);
+            this.alerts.checkAlerts(finalData);
+
+            // Only show success toast for manual refreshes
+            if (isManualRefresh) {
+                showToast('Data updated successfully', 'success');
+            }
+        } else {
+            showToast('Some data failed to load', 'warning');
+        }
+    }
+
     updateAllSections(data) {
         // Store data for export
         this.currentSystemData = data.system;
@@ -386,10 +456,10 @@ class SystemMonitor {
                     </div>
                     <div class="info-item">
                         <span><i class="fas fa-tachometer-alt"></i> GPU Usage:</span>
-                        <span>${gpu.utilization}%</span>
+                        <span>${gpu.utilization ?? 'N/A'}%</span>
                     </div>
                     <div class="progress-bar">
-                        <div class="progress-fill progress-gpu" style="width: ${gpu.utilization}%"></div>
+                        <div class="progress-fill progress-gpu" style="width: ${gpu.utilization || 0}%"></div>
                     </div>
                     <div class="info-item">
                         <span><i class="fas fa-memory"></i> Memory Usage:</span>
@@ -397,7 +467,7 @@ class SystemMonitor {
                     </div>
                     <div class="info-item">
                         <span><i class="fas fa-thermometer-half"></i> Temperature:</span>
-                        <span>${gpu.temperature}°C</span>
+                        <span>${gpu.temperature ?? 'N/A'}°C</span>
                     </div>
                     ${gpu.driver_version ? `
                         <div class="info-item">
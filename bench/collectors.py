@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Benchmark every collector against synthetic host trees.
+
+Builds a fake host under a temporary directory (procfs with N processes,
+/mnt pools with their mount table, emhttp disks.ini/var.ini with N drives,
+hwmon chips, diskstats, cgroupfs containers and a stub nvidia-smi), points
+app/main.py at it and times each collector at several scales. Reports p50,
+p95 and max latency plus the peak memory allocated by one call, and exits
+with status 1 when a p95 goes over its budget or when the process table's
+incrementally kept group totals stop matching a recount from scratch.
+
+    python bench/collectors.py
+    python bench/collectors.py --processes 100,1000 --disks 4 --iterations 50
+    python bench/collectors.py --budget-factor 2    # slower machine
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# p95 budgets in milliseconds, per collector and scale
+BUDGETS = {
+    ("process_table", 100): 10,
+    ("process_table", 1000): 60,
+    ("process_table", 10000): 600,
+    ("top_processes", 100): 1,
+    ("top_processes", 1000): 5,
+    ("top_processes", 10000): 50,
+    ("pools", 4): 20,
+    ("pools", 30): 100,
+    ("drive_temperatures", 4): 1,
+    ("drive_temperatures", 30): 1,
+    ("drive_temperatures_reparse", 4): 5,
+    ("drive_temperatures_reparse", 30): 20,
+    ("array", 4): 1,
+    ("array", 30): 1,
+    ("temperatures", 4): 5,
+    ("temperatures", 30): 10,
+    ("sensors", 4): 5,
+    ("sensors", 30): 10,
+    ("disk_io", 4): 5,
+    ("disk_io", 30): 10,
+    ("containers", 20): 20,
+    ("gpu", 2): 250,
+    ("cpu", 1): 20,
+    ("memory", 1): 20,
+    ("network", 1): 20,
+}
+
+PROCESS_NAMES = ["python3", "nginx", "postgres", "shfs", "smbd", "qemu-system-x86", "dockerd", "plex"]
+CONTAINER_COUNT = 20
+
+NVIDIA_SMI_STUB = """#!/bin/sh
+case "$*" in
+  *query-compute-apps*) echo "00000000:01:00.0, 1234"; echo "00000000:02:00.0, 99"; exit 0;;
+esac
+echo "NVIDIA GeForce RTX 3080, 45, 12, 10240, 1024, 9216, 3, 535.54, 00000000:01:00.0, 1710, 9501, 85.5, 320.00"
+echo "Tesla P4, 38, [N/A], 7680, 0, 7680, 0, 535.54, 00000000:02:00.0, 1000, 3000, [N/A], 75.00"
+"""
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def container_id(index):
+    return f"{index:064x}"
+
+
+def build_proc(root, count):
+    """procfs with meminfo, uptime and count processes in a few process trees"""
+    write(os.path.join(root, "meminfo"), "MemTotal:       32768000 kB\nMemFree:        16384000 kB\n")
+    write(os.path.join(root, "uptime"), "86400.00 172800.00\n")
+    for pid in range(1, count + 1):
+        ppid = 0 if pid == 1 else random.choice((1, max(pid // 10, 1)))
+        name = PROCESS_NAMES[pid % len(PROCESS_NAMES)]
+        ticks = random.randint(0, 100000)
+        fields = [str(pid), f"({name})", "S", str(ppid)] + ["0"] * 9
+        fields += [str(ticks // 2), str(ticks // 2), "0", "0", "20", "0", str(random.randint(1, 40)), "0"]
+        fields += [str(random.randint(1, 8000000)), "123456", str(random.randint(100, 50000))]
+        fields += ["0"] * 30
+        write(os.path.join(root, str(pid), "stat"), " ".join(fields) + "\n")
+        write(
+            os.path.join(root, str(pid), "io"),
+            f"rchar: 1\nwchar: 2\nsyscr: 3\nsyscw: 4\n"
+            f"read_bytes: {random.randint(0, 10**9)}\nwrite_bytes: {random.randint(0, 10**9)}\n"
+            "cancelled_write_bytes: 0\n",
+        )
+        cgroup = f"/docker/{container_id(pid % CONTAINER_COUNT)}" if pid % 3 == 0 else "/system.slice"
+        write(os.path.join(root, str(pid), "cgroup"), f"0::{cgroup}\n")
+
+
+def build_disks(root, count):
+    """/mnt pools, their mount table, emhttp state, drivetemp chips and diskstats"""
+    mounts = ["rootfs / rootfs rw 0 0", "tmpfs /run tmpfs rw 0 0"]
+    sections = []
+    diskstats = []
+    for index in range(count):
+        name = "parity" if index == 0 else f"disk{index}"
+        device = "sd" + chr(ord("b") + index % 24) + ("" if index < 24 else chr(ord("a") + index // 24))
+        spun_down = index % 3 == 2
+        if name != "parity":
+            os.makedirs(os.path.join(root, "mnt", name), exist_ok=True)
+            mounts.append(f"/dev/md{index} /mnt/{name} xfs rw,noatime 0 0")
+        sections.append(
+            "\n".join(
+                [
+                    f'["{name}"]',
+                    f'name="{name}"',
+                    f'device="{device}"',
+                    'status="DISK_OK"',
+                    f'type="{"Parity" if index == 0 else "Data"}"',
+                    f'temp="{"*" if spun_down else 30 + index % 15}"',
+                    f'spundown="{int(spun_down)}"',
+                    'rotational="1"',
+                    'size="3907018532"',
+                    'fsType="xfs"',
+                    'fsSize="3905109820"',
+                    f'fsUsed="{random.randint(0, 3905109820)}"',
+                    'fsFree="1000000000"',
+                    f'numReads="{random.randint(0, 10**6)}"',
+                    f'numWrites="{random.randint(0, 10**6)}"',
+                    'numErrors="0"',
+                ]
+            )
+        )
+        chip = os.path.join(root, "hwmon", f"hwmon{index + 10}")
+        write(os.path.join(chip, "name"), "drivetemp\n")
+        write(os.path.join(chip, "temp1_input"), f"{(30 + index % 15) * 1000}\n")
+        os.makedirs(os.path.join(chip, "device", "block", device), exist_ok=True)
+        for partition in ("", "1"):
+            values = " ".join(str(random.randint(0, 10**8)) for _ in range(11))
+            diskstats.append(f"   8       {index * 16}  {device}{partition} {values} 0 0 0 0")
+
+    os.makedirs(os.path.join(root, "mnt", "cache"), exist_ok=True)
+    os.makedirs(os.path.join(root, "mnt", "user"), exist_ok=True)
+    mounts += ["/dev/nvme0n1p1 /mnt/cache btrfs rw 0 0", "shfs /mnt/user fuse.shfs rw 0 0"]
+    write(os.path.join(root, "proc", "mounts"), "\n".join(mounts) + "\n")
+    write(os.path.join(root, "proc", "diskstats"), "\n".join(diskstats) + "\n")
+    write(os.path.join(root, "emhttp", "disks.ini"), "\n".join(sections) + "\n")
+    write(
+        os.path.join(root, "emhttp", "var.ini"),
+        'mdState="STARTED"\n'
+        f'mdNumDisks="{count}"\n'
+        'mdResync="3907018532"\nmdResyncPos="1953509266"\nmdResyncAction="check P"\n'
+        'mdResyncDt="10"\nmdResyncDb="1500000"\nsbSynced="1760000000"\nsbSyncErrs="0"\n',
+    )
+
+    cpu = os.path.join(root, "hwmon", "hwmon0")
+    write(os.path.join(cpu, "name"), "coretemp\n")
+    for core in range(1, 9):
+        write(os.path.join(cpu, f"temp{core}_input"), f"{40000 + core * 1000}\n")
+        write(os.path.join(cpu, f"temp{core}_label"), f"Core {core - 1}\n")
+    board = os.path.join(root, "hwmon", "hwmon1")
+    write(os.path.join(board, "name"), "nct6775\n")
+    for fan in range(1, 5):
+        write(os.path.join(board, f"fan{fan}_input"), f"{800 + fan * 100}\n")
+        write(os.path.join(board, f"in{fan}_input"), f"{1000 + fan * 10}\n")
+
+
+def build_cgroups(root):
+    """cgroup v2 tree with CONTAINER_COUNT Docker containers"""
+    write(os.path.join(root, "cgroup.controllers"), "cpu io memory\n")
+    for index in range(CONTAINER_COUNT):
+        base = os.path.join(root, "system.slice", f"docker-{container_id(index)}.scope")
+        write(os.path.join(base, "cpu.stat"), f"usage_usec {random.randint(0, 10**10)}\nuser_usec 0\n")
+        write(os.path.join(base, "memory.current"), f"{random.randint(10**6, 10**9)}\n")
+        write(os.path.join(base, "memory.peak"), f"{10**9}\n")
+        write(os.path.join(base, "io.stat"), f"8:16 rbytes={random.randint(0, 10**9)} wbytes=0 rios=0 wios=0\n")
+
+
+def load_app(data_dir):
+    os.environ["DATA_DIR"] = data_dir
+    sys.path.insert(0, os.path.abspath(APP_DIR))
+    import main
+
+    return main
+
+
+def point_at(main, root, disks_root=None):
+    """Swap the module's host paths and stateful readers for the fixture tree"""
+    main.HOST_PASSWD_PATH = os.path.join(root, "passwd")
+    main.process_table = main.ProcessTable(os.path.join(root, "proc"))
+    main.container_stats = main.CgroupStats(os.path.join(root, "cgroup"))
+    main.gpu_backend = main.NvidiaSmiQueryBackend(os.path.join(root, "nvidia-smi"))
+    if disks_root:
+        main.HOST_MNT_PATH = os.path.join(disks_root, "mnt")
+        main.HOST_MOUNTS_PATH = os.path.join(disks_root, "proc", "mounts")
+        main.HOST_DISKSTATS_PATH = os.path.join(disks_root, "proc", "diskstats")
+        main.SYS_BLOCK_PATH = os.path.join(disks_root, "block")
+        main.EMHTTP_PATH = os.path.join(disks_root, "emhttp")
+        main.mount_table = main.MountTable(main.HOST_MOUNTS_PATH)
+        main.emhttp = main.EmhttpState(main.EMHTTP_PATH)
+        main.hwmon = main.HwmonRegistry(os.path.join(disks_root, "hwmon"))
+        main.disk_stats = main.DiskStats()
+        main.last_disk_usage.clear()
+
+
+def measure(func, iterations):
+    """Warm up once (rate collectors need a previous reading), then time and trace"""
+    func()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+        "max": timings[-1],
+        "peak_kib": peak / 1024,
+    }
+
+
+def churn_proc(root, step):
+    """Let some processes exit, reparent others to init and rename a few"""
+    for name in os.listdir(root):
+        if not name.isdigit() or name == "1":
+            continue
+        pid = int(name)
+        if (pid + step) % 5 == 0:
+            shutil.rmtree(os.path.join(root, name))
+            continue
+        stat_path = os.path.join(root, name, "stat")
+        with open(stat_path) as f:
+            fields = f.read().split()
+        if (pid + step) % 5 == 1:
+            fields[3] = "1"
+        if (pid + step) % 7 == 0:
+            fields[1] = f"(renamed{step})"
+        fields[13] = str(int(fields[13]) + random.randint(0, 500))
+        write(stat_path, " ".join(fields) + "\n")
+
+
+def check_group_totals(main):
+    """Differences between the incremental group totals and a recount of the current entries"""
+    table = main.process_table
+    expected = {mode: {} for mode in main.PROCESS_GROUP_MODES}
+    for entry in table.entries.values():
+        for groups, key in zip(expected.values(), (entry.name, entry.tree, entry.cgroup)):
+            totals = groups.setdefault(key, [0.0, 0, 0.0, 0])
+            for index, value in enumerate(entry.usage):
+                totals[index] += value
+            totals[3] += 1
+
+    problems = []
+    for mode, groups in table.group_totals(limit=len(table.entries) + 1).items():
+        actual = {group["group"]: group for group in groups}
+        for key in set(actual) | set(expected[mode]):
+            group = actual.get(key)
+            totals = expected[mode].get(key)
+            if group is None or totals is None:
+                problems.append(f"{mode} {key!r}: {'missing' if group is None else 'unexpected'}")
+            elif (
+                group["count"] != totals[3]
+                or abs(group["cpu_percent"] - totals[0]) > 0.1
+                or abs(group["memory_mb"] - totals[1] / 1024 / 1024) > 1e-6
+                or abs(group["io_rate"] - totals[2]) > 1e-3
+            ):
+                problems.append(f"{mode} {key!r}: {group} != {totals}")
+    return problems
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", default="100,1000,10000", help="process counts to test")
+    parser.add_argument("--disks", default="4,30", help="drive counts to test")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--budget-factor", type=float, default=1.0, help="scale every budget")
+    parser.add_argument("--no-budgets", action="store_true", help="report only, never fail")
+    args = parser.parse_args()
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory(prefix="collector-bench-") as root:
+        data_dir = os.path.join(root, "data")
+        os.makedirs(data_dir)
+        main = load_app(data_dir)
+
+        write(os.path.join(root, "passwd"), "root:x:0:0:root:/root:/bin/sh\n")
+        build_cgroups(os.path.join(root, "cgroup"))
+        write(os.path.join(root, "nvidia-smi"), NVIDIA_SMI_STUB)
+        os.chmod(os.path.join(root, "nvidia-smi"), 0o755)
+
+        cases = []
+        for count in [int(n) for n in args.processes.split(",") if n]:
+            proc = os.path.join(root, f"proc-{count}")
+            build_proc(os.path.join(proc, "proc"), count)
+            write(os.path.join(proc, "passwd"), "root:x:0:0:root:/root:/bin/sh\n")
+            os.symlink(os.path.join(root, "cgroup"), os.path.join(proc, "cgroup"))
+            os.symlink(os.path.join(root, "nvidia-smi"), os.path.join(proc, "nvidia-smi"))
+            cases.append((proc, None, [("process_table", count, lambda: main.get_process_table())], None))
+            table = {}
+
+            def load_table(table=table):
+                table.update(main.get_process_table())
+
+            def top_processes(table=table):
+                return main.get_top_processes(table["processes"], "cpu", 10, [], [], False)
+
+            cases.append((proc, None, [("top_processes", count, top_processes)], load_table))
+
+        for count in [int(n) for n in args.disks.split(",") if n]:
+            disks = os.path.join(root, f"disks-{count}")
+            build_disks(disks, count)
+            disks_ini = os.path.join(disks, "emhttp", "disks.ini")
+
+            def reparse(disks_ini=disks_ini):
+                now = time.time()
+                os.utime(disks_ini, (now, now))
+                return main.get_drive_temperatures()
+
+            cases.append(
+                (
+                    root,
+                    disks,
+                    [
+                        ("pools", count, lambda: main.get_pools_info()),
+                        ("drive_temperatures", count, lambda: main.get_drive_temperatures()),
+                        ("drive_temperatures_reparse", count, reparse),
+                        ("array", count, lambda: main.get_array_info()),
+                        ("temperatures", count, lambda: main.get_temperature_info()),
+                        ("sensors", count, lambda: main.get_sensor_info()),
+                        ("disk_io", count, lambda: main.get_disk_io_info()),
+                    ],
+                    None,
+                )
+            )
+
+        cases.append(
+            (
+                root,
+                None,
+                [
+                    ("containers", CONTAINER_COUNT, lambda: main.get_container_stats()),
+                    ("gpu", 2, lambda: main.get_gpu_info()),
+                    ("cpu", 1, lambda: main.get_cpu_info()),
+                    ("memory", 1, lambda: main.get_memory_info()),
+                    ("network", 1, lambda: main.get_network_info()),
+                ],
+                None,
+            )
+        )
+
+        print(f"{'collector':<28}{'scale':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'peak KiB':>11}{'budget':>9}")
+        failures = []
+        for fixture, disks, benchmarks, setup in cases:
+            point_at(main, fixture, disks)
+            if setup is not None:
+                setup()
+            for name, scale, func in benchmarks:
+                result = measure(func, args.iterations)
+                budget = BUDGETS.get((name, scale))
+                limit = budget * args.budget_factor if budget is not None else None
+                over = limit is not None and result["p95"] > limit
+                if over:
+                    failures.append((name, scale, result["p95"], limit))
+                print(
+                    f"{name:<28}{scale:>7}{result['p50']:>10.3f}{result['p95']:>10.3f}"
+                    f"{result['max']:>10.3f}{result['peak_kib']:>11.1f}"
+                    f"{(f'{limit:g}' if limit is not None else '-'):>9}{'  OVER' if over else ''}"
+                )
+
+        # Processes exiting, being reparented and renamed must leave the group totals exact
+        count = min(int(n) for n in args.processes.split(",") if n)
+        churned = os.path.join(root, "churn")
+        shutil.copytree(os.path.join(root, f"proc-{count}"), churned, symlinks=True)
+        point_at(main, churned)
+        problems = []
+        main.process_table.scan()
+        for step in range(3):
+            churn_proc(os.path.join(churned, "proc"), step)
+            main.process_table.scan()
+            problems += check_group_totals(main)
+        print()
+        print(f"group totals after churn: {len(problems)} mismatches")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+
+    if problems:
+        return 1
+    if failures and not args.no_budgets:
+        print()
+        for name, scale, p95, limit in failures:
+            print(f"{name} at {scale}: p95 {p95:.3f} ms is over its {limit:g} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())